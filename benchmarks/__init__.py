@@ -0,0 +1,6 @@
+"""Benchmarks of the hot paths of the organizer.
+
+They run on a synthetic library (see :mod:`benchmarks.generate_library`) with
+the stand-in calibre and poppler scripts of `benchmarks/bin`, so they don't
+require these tools to be installed. Not installed with the package.
+"""
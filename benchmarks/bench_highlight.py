@@ -0,0 +1,76 @@
+"""Benchmark the highlighting of the old filename in the header of a file.
+
+Compare the previous implementation (one `re.sub` per token, called once for
+the missing tokens and once for the similar tokens, followed by the year
+search and three `str.replace` passes) with the single-pass
+:func:`interactive_organizer.lib.highlight_tokens`.
+
+Usage::
+
+   python -m benchmarks.bench_highlight [-n NUMBER] [--words WORDS]
+"""
+import argparse
+import random
+import re
+import timeit
+
+from interactive_organizer.lib import COLORS, TokenMatcher, blue, get_re_year
+
+WORDS = ['Introduction', 'to', 'the', 'Theory', 'of', 'Computation', 'Élements', 'Analyse',
+         'Fonctionnelle', 'Handbook', 'Quantum', 'Mechanics', 'Straße', 'Geschichte', 'Principles',
+         'Économie', 'Politique', 'Volume', 'Edition', 'Algorithms', 'Data', 'Structures']
+
+
+def legacy_color_tokens_in_string(s, tokens, color='red'):
+    def color_sub(sub):
+        if color == 'red':
+            return f'REDCODE{sub}NCCODE'
+        return f'GREENCODE{sub}NCCODE'
+    for token in tokens:
+        s = re.sub(r"([\W\d_]*)({})([\W\d_]+)".format(token), r'\1' + color_sub(r'\2') + r'\3', s, 0,
+                   re.MULTILINE)
+    return s
+
+
+def legacy_highlight(old_name, similar_tokens, missing_tokens):
+    old_name_hl = legacy_color_tokens_in_string(old_name, missing_tokens)
+    old_name_hl = legacy_color_tokens_in_string(old_name_hl, similar_tokens, 'green')
+    match = re.search(get_re_year(), old_name_hl)
+    if match:
+        old_name_hl = old_name_hl.replace(match.group(), blue(match.group()))
+    old_name_hl = old_name_hl.replace('REDCODE', COLORS['RED'])
+    old_name_hl = old_name_hl.replace('GREENCODE', COLORS['GREEN'])
+    old_name_hl = old_name_hl.replace('NCCODE', COLORS['NC'])
+    return old_name_hl
+
+
+def make_names(n_words, seed=0):
+    rng = random.Random(seed)
+    old_words = rng.choices(WORDS, k=n_words)
+    new_words = rng.sample(old_words, k=max(1, n_words // 2))
+    old_name = ' '.join(old_words) + f' ({rng.randint(1950, 2022)}).pdf'
+    new_name = ' '.join(new_words) + '.pdf'
+    return old_name, new_name
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the old filename highlighting.')
+    parser.add_argument('-n', '--number', type=int, default=2000,
+                        help='Number of highlights per measurement.')
+    parser.add_argument('--words', type=int, nargs='+', default=[8, 32, 128],
+                        help='Number of words in the old filenames.')
+    args = parser.parse_args()
+    matcher = TokenMatcher()
+    print(f"{'words':>6} {'legacy (ms)':>12} {'single-pass (ms)':>17} {'speedup':>8}")
+    for n_words in args.words:
+        old_name, new_name = make_names(n_words)
+        similar_tokens, missing_tokens = matcher.compare(old_name, new_name)
+        legacy = min(timeit.repeat(lambda: legacy_highlight(old_name, similar_tokens, missing_tokens),
+                                   number=args.number, repeat=3))
+        single = min(timeit.repeat(lambda: matcher.highlight(old_name, similar_tokens, missing_tokens),
+                                   number=args.number, repeat=3))
+        print(f'{n_words:>6} {legacy * 1000:>12.1f} {single * 1000:>17.1f} {legacy / single:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
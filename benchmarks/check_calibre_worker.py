@@ -0,0 +1,142 @@
+"""Check the persistent calibre worker with the stand-in `calibre-debug`.
+
+The stand-in commands of `benchmarks/bin` are run through a
+:class:`CalibreWorkerPool` and as new processes, and the checks fail if:
+
+- their outputs differ (`ebook-meta`, `fetch-ebook-metadata`, `ebook-convert`),
+- the worker is not started again after it was killed,
+- a command isn't run in a new process when the worker crashes while running
+  it or when the worker can't be started at all,
+- a command that takes too long doesn't time out.
+
+The mean time of `ebook-meta` with and without the worker is also shown, for a
+calibre startup of `--startup` seconds.
+
+Exit with 1 if one of the checks fails.
+
+Usage::
+
+   python -m benchmarks.check_calibre_worker [-n NUMBER] [--startup SECONDS]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.generate_library import generate_library
+from interactive_organizer import lib
+
+BIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bin')
+
+
+def check(name, ok):
+    print(f'{name:<56}' + ('ok' if ok else 'FAILED'))
+    return ok
+
+
+def one_shot(cmd, args):
+    return subprocess.run([cmd] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+
+def mean_time(func, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) / number * 1000
+
+
+def run_checks(tmp_dir, number, startup):
+    ok = True
+    file_path = generate_library(os.path.join(tmp_dir, 'library'), 1)[0]
+    lib.metrics.enabled = True
+    pool = lib.CalibreWorkerPool(1)
+    try:
+        for cmd, args in [('ebook-meta', [file_path]),
+                          ('fetch-ebook-metadata', ['--isbn=9780262033848', '--allowed-plugin=Google'])]:
+            result = pool.run(cmd, args)
+            expected = one_shot(cmd, args)
+            ok &= check(f'{cmd} output', result is not None and
+                        (result.returncode, result.stdout) == (expected.returncode, expected.stdout))
+        output_file = os.path.join(tmp_dir, 'converted.part')
+        result = lib.convert_with_calibre_pool(pool, file_path, output_file)
+        with open(file_path) as f1, open(output_file) as f2:
+            ok &= check('ebook-convert output', result is not None and result.returncode == 0
+                        and f1.read() == f2.read())
+        worker = pool._workers[0]
+        os.killpg(worker._proc.pid, signal.SIGKILL)
+        worker._proc.wait()
+        result = pool.run('ebook-meta', [file_path])
+        ok &= check('worker started again after it was killed', result is not None and result.returncode == 0
+                    and lib.metrics.summary()['counters'].get('calibre_worker_starts') == 2)
+    finally:
+        pool.close()
+
+    # A worker that is killed while it runs a command
+    os.environ['BENCH_META_DELAY'] = '2'
+    pool = lib.CalibreWorkerPool(1)
+    try:
+        pool.run('ebook-meta', [file_path])
+        threading.Timer(0.5, lambda: os.killpg(pool._workers[0]._proc.pid, signal.SIGKILL)).start()
+        result = pool.run('ebook-meta', [file_path])
+        os.environ['BENCH_META_DELAY'] = '0.05'
+        ebook_meta = lib.get_cached_ebook_metadata(file_path, calibre_pool=pool)
+        ok &= check('command run in a new process after a crash',
+                    result is None and ebook_meta == one_shot('ebook-meta', [file_path]).stdout)
+    finally:
+        pool.close()
+
+    os.environ['BENCH_FETCH_DELAY'] = '5'
+    pool = lib.CalibreWorkerPool(1)
+    try:
+        start = time.perf_counter()
+        try:
+            pool.run('fetch-ebook-metadata', ['--isbn=9780262033848'], timeout=0.5)
+            timed_out = False
+        except subprocess.TimeoutExpired:
+            timed_out = time.perf_counter() - start < 2
+        ok &= check('timeout', timed_out)
+    finally:
+        pool.close()
+        os.environ['BENCH_FETCH_DELAY'] = '0.1'
+
+    pool = lib.CalibreWorkerPool(1, 'no-such-calibre-debug -e {script}')
+    try:
+        results = [pool.run('ebook-meta', [file_path]) for _ in range(lib.CALIBRE_WORKER_MAX_STARTS + 1)]
+        ok &= check("no worker if it can't be started", results == [None] * len(results)
+                    and pool._workers[0].failed_starts == lib.CALIBRE_WORKER_MAX_STARTS)
+    finally:
+        pool.close()
+
+    os.environ['BENCH_CALIBRE_STARTUP'] = str(startup)
+    os.environ['BENCH_META_DELAY'] = '0'
+    pool = lib.CalibreWorkerPool(1)
+    try:
+        # NOTE: the first request waits for the worker to start
+        pool.run('ebook-meta', [file_path])
+        with_worker = mean_time(lambda: pool.run('ebook-meta', [file_path]), number)
+    finally:
+        pool.close()
+    without_worker = mean_time(lambda: one_shot('ebook-meta', [file_path]), number)
+    print(f'\nebook-meta (calibre startup: {startup} s): {without_worker:.1f} ms per call in a new process, '
+          f'{with_worker:.1f} ms in the worker')
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--number', type=int, default=10, help='Number of runs of ebook-meta for the timings.')
+    parser.add_argument('--startup', type=float, default=0.5,
+                        help='Startup time (in seconds) of the stand-in calibre commands for the timings.')
+    args = parser.parse_args()
+    os.environ['PATH'] = BIN_DIR + os.pathsep + os.environ.get('PATH', '')
+    with tempfile.TemporaryDirectory(prefix='interactive_organizer_calibre_') as tmp_dir:
+        ok = run_checks(tmp_dir, args.number, args.startup)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Check the conversions to text saved in the conversion cache.
+
+An EPUB (converted with the stand-in `ebook-convert` of `benchmarks/bin`,
+which uses the extension of its output file as the output format) is read
+with the `l` option and in the background (`--preconvert`) and the checks fail
+if:
+
+- its conversion isn't saved in the cache or differs from the ebook,
+- it is converted again the next time it is read,
+- a temporary file is left in the cache folder,
+- the temporary files of the interrupted conversions aren't removed.
+
+Exit with 1 if one of the checks fails.
+
+Usage::
+
+   python -m benchmarks.check_conversion_cache
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from interactive_organizer import lib
+
+BIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bin')
+
+
+def check(name, ok):
+    print(f'{name:<56}' + ('ok' if ok else 'FAILED'))
+    return ok
+
+
+def read(file_path):
+    try:
+        with open(file_path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def run_checks(tmp_dir):
+    ok = True
+    file_path = os.path.join(tmp_dir, 'book.epub')
+    with open(file_path, 'w') as f:
+        f.write('Dummy ebook\nISBN 9780262033848\n')
+    cache = lib.ConversionCache(os.path.join(tmp_dir, 'txt'))
+    # The files shown by the `l` option (less needs a terminal)
+    shown = []
+    lib.less = shown.append
+
+    lib.open_with_less(file_path, conversion_cache=cache)
+    cached_file_txt = cache.get(file_path, 'ebook-convert')
+    ok &= check('EPUB conversion saved in the cache',
+                cached_file_txt is not None and read(cached_file_txt) == read(file_path))
+    hits = lib.metrics.summary()['counters'].get('conversion_cache_hits', 0)
+    lib.open_with_less(file_path, conversion_cache=cache)
+    ok &= check('cached conversion shown the next time', shown == [cached_file_txt, cached_file_txt] and
+                lib.metrics.summary()['counters'].get('conversion_cache_hits', 0) == hits + 1)
+    ok &= check('no temporary file left in the cache',
+                cached_file_txt is not None and os.listdir(cache.cache_dir) == [os.path.basename(cached_file_txt)])
+
+    stale_file_txt = cache.reserve(file_path, 'djvutxt')
+    old = time.time() - 2 * 24 * 3600
+    os.utime(stale_file_txt, (old, old))
+    cache.evict()
+    ok &= check('interrupted conversions removed', not os.path.exists(stale_file_txt)
+                and cached_file_txt is not None and os.path.exists(cached_file_txt)
+                and cache.total_size == os.path.getsize(cached_file_txt))
+
+    # Converted in the background
+    file_path = os.path.join(tmp_dir, 'book2.epub')
+    with open(file_path, 'w') as f:
+        f.write('Another dummy ebook\n')
+    preconverter = lib.Preconverter(cache, 1)
+    try:
+        preconverter.schedule(file_path)
+        preconverter.wait(file_path)
+    finally:
+        preconverter.shutdown()
+    cached_file_txt = cache.get(file_path, 'ebook-convert')
+    ok &= check('EPUB converted in the background',
+                cached_file_txt is not None and read(cached_file_txt) == read(file_path))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+    os.environ['PATH'] = BIN_DIR + os.pathsep + os.environ.get('PATH', '')
+    lib.metrics.enabled = True
+    with tempfile.TemporaryDirectory(prefix='interactive_organizer_conversions_') as tmp_dir:
+        ok = run_checks(tmp_dir)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Check the moves of the organizer to its output folder.
+
+Files with the same name are moved with `organize_ebooks`'s own
+`move_or_link_file` (which doesn't replace an existing file) and the checks
+fail if:
+
+- a file isn't moved (or is moved to a name that was already taken),
+- its content or its metadata file isn't found at its new path,
+- a file is left at a name chosen for a move (e.g. an empty placeholder),
+- a name taken by another program after it was chosen isn't replaced by the
+  next available one,
+- two files moved at the same time (e.g. by two transfer threads) to the same
+  name aren't both moved,
+- the journal doesn't record the paths where the files were really moved.
+
+Exit with 1 if one of the checks fails.
+
+Usage::
+
+   python -m benchmarks.check_moves [-n NUMBER]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+
+from interactive_organizer import lib
+
+
+def check(name, ok):
+    print(f'{name:<56}' + ('ok' if ok else 'FAILED'))
+    return ok
+
+
+def new_file(file_path, content):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w') as f:
+        f.write(content)
+
+
+def read(file_path):
+    try:
+        with open(file_path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def run_checks(tmp_dir, number):
+    ok = True
+    input_folder = os.path.join(tmp_dir, 'input')
+    output_folder = os.path.join(tmp_dir, 'output')
+    # Files with the same name in different subfolders
+    file_paths = []
+    for i in range(number):
+        file_path = os.path.join(input_folder, str(i), 'book.pdf')
+        new_file(file_path, f'ebook {i}')
+        new_file(f'{file_path}.meta', f'metadata {i}')
+        file_paths.append(file_path)
+    # Already in the output folder
+    new_file(os.path.join(output_folder, 'book.pdf'), 'existing')
+
+    organizer = lib.InteractiveOrganizer()
+    journal_path = os.path.join(tmp_dir, 'journal.jsonl')
+    organizer._journal = lib.SessionJournal(journal_path, input_folder)
+    try:
+        for file_path in file_paths[:-1]:
+            organizer._move_or_link_file_and_maybe_meta(output_folder, file_path, f'{file_path}.meta')
+        # Another program takes the name chosen for the last file before it is moved
+        file_path = file_paths[-1]
+        new_path = organizer._destination_index.unique_filename(output_folder, 'book.pdf')
+        placeholder = os.path.exists(new_path)
+        new_file(new_path, 'other program')
+        organizer._move_or_link_job(file_path, new_path, f'{file_path}.meta')
+    finally:
+        organizer._journal.close()
+
+    with open(journal_path) as f:
+        moves = {entry['path']: entry['new_path'] for entry in map(json.loads, f)}
+    ok &= check('no placeholder at the chosen name', not placeholder)
+    ok &= check('files already in the output folder not replaced',
+                read(os.path.join(output_folder, 'book.pdf')) == 'existing' and read(new_path) == 'other program')
+    ok &= check('all files moved', not any(os.path.exists(file_path) for file_path in file_paths)
+                and len(moves) == number and len(set(moves.values())) == number)
+    ok &= check('contents and metadata at their new paths',
+                all(read(moves[os.path.relpath(file_path, input_folder)]) == f'ebook {i}'
+                    and read(moves[os.path.relpath(file_path, input_folder)] + '.meta') == f'metadata {i}'
+                    for i, file_path in enumerate(file_paths)))
+    ok &= check('name taken by another program replaced',
+                moves[os.path.relpath(file_paths[-1], input_folder)] != new_path)
+    ok &= check('no empty file in the output folder',
+                all(entry.stat().st_size for entry in os.scandir(output_folder)))
+
+    # Two transfer threads move files to the same name
+    organizer._journal = None
+    racing_folder = os.path.join(tmp_dir, 'racing')
+    file_paths = []
+    for i in range(2):
+        file_path = os.path.join(input_folder, f'racing{i}', 'book.pdf')
+        new_file(file_path, f'racing ebook {i}')
+        file_paths.append(file_path)
+    new_path = organizer._destination_index.unique_filename(racing_folder, 'book.pdf')
+    barrier = threading.Barrier(len(file_paths))
+
+    def move(file_path):
+        barrier.wait()
+        organizer._move_or_link_job(file_path, new_path, f'{file_path}.meta')
+
+    threads = [threading.Thread(target=move, args=(file_path,)) for file_path in file_paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    contents = sorted(filter(None, map(read, (entry.path for entry in os.scandir(racing_folder)))))
+    ok &= check('files moved at the same time to the same name',
+                not any(os.path.exists(file_path) for file_path in file_paths)
+                and contents == [f'racing ebook {i}' for i in range(len(file_paths))])
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--number', type=int, default=5, help='Number of files with the same name moved.')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory(prefix='interactive_organizer_moves_') as tmp_dir:
+        ok = run_checks(tmp_dir, args.number)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Check that the script starts within its time budget.
+
+The script is launched a few times with `--version` and `--help` in a fresh
+interpreter (as done by a shell or another script) and the median wall time of
+each command is compared with its budget. `--version` and `--help` must also
+not load `organize_ebooks` (i.e. `interactive_organizer.lib` must stay lazy)
+and the heavy standard modules of :data:`HEAVY_MODULES` must not be imported by
+`--help`.
+
+NOTE: since `organize_ebooks` is not loaded, the timings don't depend on it but
+the location of the installed package is shown so that the checks are run with
+the real dependency (e.g. not a stand-in).
+
+Exit with 1 if one of the budgets is exceeded.
+
+Usage::
+
+   python -m benchmarks.check_startup [-n NUMBER] [--version-budget MS] [--help-budget MS]
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# In milliseconds, including the startup of the interpreter itself
+VERSION_BUDGET = 150
+HELP_BUDGET = 400
+SCRIPT = 'interactive_organizer.scripts.interactive_organizer'
+# Only needed once a session starts
+HEAVY_MODULES = {'concurrent.futures', 'ctypes', 'readline', 'sqlite3', 'termios'}
+
+
+def measure(cmd, number):
+    timings = []
+    for _ in range(number):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True,
+                       env=dict(os.environ, COLUMNS='120'))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def loaded_modules(args):
+    # NOTE: `--help` exits from the parser, the modules are printed on stderr
+    code = (f'import sys; sys.argv = ["interactive_organizer"] + {args!r}\n'
+            f'from {SCRIPT} import main\n'
+            'try:\n    main()\n'
+            'finally:\n    print(" ".join(sys.modules), file=sys.stderr)')
+    result = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    return set(result.stderr.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--number', type=int, default=5, help='Number of runs per command.')
+    parser.add_argument('--version-budget', type=float, default=VERSION_BUDGET,
+                        help='Budget (in ms) for `--version`.')
+    parser.add_argument('--help-budget', type=float, default=HELP_BUDGET, help='Budget (in ms) for `--help`.')
+    args = parser.parse_args()
+    ok = True
+    spec = importlib.util.find_spec('organize_ebooks')
+    print(f'organize_ebooks: {spec.origin if spec else "not installed"}')
+    # Startup of the interpreter alone, for reference
+    baseline = measure([sys.executable, '-c', 'pass'], args.number)
+    print(f'{"python -c pass":<20}{baseline:8.1f} ms')
+    for cmd_args, budget in [(['--version'], args.version_budget), (['--help'], args.help_budget)]:
+        median = measure([sys.executable, '-m', SCRIPT] + cmd_args, args.number)
+        status = 'ok' if median <= budget else 'OVER BUDGET'
+        ok &= median <= budget
+        print(f'{" ".join(cmd_args):<20}{median:8.1f} ms (budget: {budget:.0f} ms) {status}')
+    for cmd_args, modules in [(['--version'], {'organize_ebooks.lib'}),
+                              (['--help'], HEAVY_MODULES | {'organize_ebooks.lib'})]:
+        loaded = modules & loaded_modules(cmd_args)
+        if loaded:
+            print(f'{" ".join(cmd_args)} loaded: {", ".join(sorted(loaded))}')
+            ok = False
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
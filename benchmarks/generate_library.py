@@ -0,0 +1,115 @@
+"""Generate a synthetic ebook library to benchmark the organizer.
+
+The dummy ebooks are small text files named like the output of
+`organize-ebooks` (e.g. `Élements d'analyse - Dieudonné (1968).pdf`), spread
+over nested sub-folders. Most of them have a `.meta` file with the fields
+saved by `organize-ebooks`, including the `Old file path` line that the
+organizer compares with the new filename. Some old filenames have extra words
+(the "missing words" of the header) and some ebooks have no metadata file.
+
+The content of a dummy ebook is a few lines of text with an ISBN so that the
+stand-in `pdftotext` (see `benchmarks/bin`) can "convert" it.
+
+Usage::
+
+   python -m benchmarks.generate_library [-n NUMBER] [--seed SEED] folder
+"""
+import argparse
+import os
+import random
+
+TITLE_WORDS = ['Introduction', 'Theory', 'Computation', 'Élements', "d'Analyse", 'Fonctionnelle', 'Handbook',
+               'Quantum', 'Mechanics', 'Straße', 'Geschichte', 'Principles', 'Économie', 'Politique',
+               'Algorithms', 'Data', 'Structures', 'Topología', 'Álgebra', 'Linéaire', 'Mathématiques',
+               'Physik', 'Cálculo', 'Probability', 'Statistics', 'Learning', 'Systems', 'Networks']
+SMALL_WORDS = ['to', 'the', 'of', 'and', 'for', 'de', 'la', 'und']
+AUTHORS = ['Dieudonné', 'Knuth', 'Cormen', 'Bourbaki', 'Gödel', 'Poincaré', 'Sipser', 'Müller', 'Núñez',
+           'Landau', 'Lifshitz', 'Erdős', 'Hilbert', 'Noether', 'Brontë']
+EXTRA_WORDS = ['scan', 'ocr', 'draft', 'v2', 'copy', 'ebook', 'lib', 'retail', 'fixed']
+EXTENSIONS = ['pdf'] * 6 + ['djvu'] * 2 + ['epub', 'doc']
+METADATA_EXTENSION = 'meta'
+
+
+def random_isbn(rng):
+    digits = [9, 7, 8] + [rng.randrange(10) for _ in range(9)]
+    check = (10 - sum(d * (3 if i % 2 else 1) for i, d in enumerate(digits)) % 10) % 10
+    return ''.join(map(str, digits + [check]))
+
+
+def random_book(rng):
+    words = [rng.choice(TITLE_WORDS)]
+    for _ in range(rng.randint(1, 5)):
+        words.append(rng.choice(SMALL_WORDS if rng.random() < 0.3 else TITLE_WORDS))
+    return {'title': ' '.join(words),
+            'authors': ' & '.join(rng.sample(AUTHORS, rng.randint(1, 2))),
+            'year': str(rng.randint(1900, 2023)),
+            'isbn': random_isbn(rng),
+            'ext': rng.choice(EXTENSIONS)}
+
+
+def old_filename(rng, book, missing_ratio):
+    # The name the file had before being organized (i.e. the `Old file path`)
+    words = book['title'].split()
+    if rng.random() < 0.5:
+        words.append(book['authors'].split(' & ')[0])
+    if rng.random() < 0.5:
+        words.insert(rng.randint(0, len(words)), book['year'])
+    if rng.random() < missing_ratio:
+        words.extend(rng.sample(EXTRA_WORDS, rng.randint(1, 3)))
+    sep = rng.choice([' ', '_', '.', '-'])
+    return sep.join(words) + '.' + book['ext']
+
+
+def generate_library(folder_path, number=1000, seed=0, meta_ratio=0.9, missing_ratio=0.3, depth=2,
+                     files_per_folder=50):
+    """Create `number` dummy ebooks in `folder_path` and return their paths.
+
+    `meta_ratio` of them have a metadata file and `missing_ratio` of these have
+    an old filename with words missing from the new filename.
+    """
+    rng = random.Random(seed)
+    file_paths = []
+    for i in range(number):
+        book = random_book(rng)
+        # Nested sub-folders, e.g. folder/03/01
+        folder_idx = i // files_per_folder
+        parts = [f'{(folder_idx // (8 ** level)) % 8:02d}' for level in range(depth)]
+        dir_path = os.path.join(folder_path, *parts)
+        os.makedirs(dir_path, exist_ok=True)
+        name = f"{book['title']} - {book['authors']} ({book['year']}).{book['ext']}"
+        file_path = os.path.join(dir_path, name)
+        if os.path.exists(file_path):
+            name = f"{book['title']} - {book['authors']} ({book['year']}) {i}.{book['ext']}"
+            file_path = os.path.join(dir_path, name)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(f"{book['title']}\n{book['authors']}\n\nCopyright {book['year']}\n"
+                    f"ISBN {book['isbn']}\n\n" + 'Lorem ipsum dolor sit amet. ' * rng.randint(10, 100))
+        if rng.random() < meta_ratio:
+            old_path = os.path.join('/home/user/Downloads', old_filename(rng, book, missing_ratio))
+            with open(f'{file_path}.{METADATA_EXTENSION}', 'w', encoding='utf-8') as f:
+                f.write(f"Title               : {book['title']}\n"
+                        f"Author(s)           : {book['authors']}\n"
+                        f"Published           : {book['year']}-01-01T00:00:00+00:00\n"
+                        f"Identifiers         : isbn:{book['isbn']}\n"
+                        f"ISBN                : {book['isbn']}\n"
+                        f"Old file path       : {old_path}\n")
+        file_paths.append(file_path)
+    return file_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('folder', help='Folder where the library is created.')
+    parser.add_argument('-n', '--number', type=int, default=1000, help='Number of ebooks.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+    parser.add_argument('--meta-ratio', type=float, default=0.9,
+                        help='Ratio of the ebooks with a metadata file.')
+    parser.add_argument('--missing-ratio', type=float, default=0.3,
+                        help='Ratio of the old filenames with missing words.')
+    args = parser.parse_args()
+    file_paths = generate_library(args.folder, args.number, args.seed, args.meta_ratio, args.missing_ratio)
+    print(f"{len(file_paths)} ebooks created in '{args.folder}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""Run the benchmarks of the organizer's hot paths and save the results as JSON.
+
+A synthetic library (see :mod:`benchmarks.generate_library`) is created in a
+temporary folder and the stand-in scripts of `benchmarks/bin` are put first in
+the `PATH`. Each benchmark is repeated `--repeat` times and its best and median
+times are saved, along with the commit and the Python version, so that the
+results of two commits can be compared with `--compare`.
+
+Usage::
+
+   python -m benchmarks.run_benchmarks [-n NUMBER] [-r REPEAT] [-o results.json]
+   python -m benchmarks.run_benchmarks --compare old.json -o new.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.generate_library import METADATA_EXTENSION, generate_library
+from interactive_organizer import lib
+
+BIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bin')
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+# Each benchmark receives the library and returns (number of items, function to time). The
+# function can have a `setup` attribute that is called (untimed) before each run.
+@benchmark('scan')
+def bench_scan(library):
+    def run():
+        # Same walk as the one done by interact()
+        for _ in lib.scan_folder(library.folder, METADATA_EXTENSION, lib.SCAN_WORKERS):
+            pass
+    return len(library.files), run
+
+
+@benchmark('scan_first_file')
+def bench_scan_first_file(library):
+    def run():
+        # Time before the first file can be reviewed
+        files = lib.scan_folder(library.folder, METADATA_EXTENSION, lib.SCAN_WORKERS)
+        next(files)
+        files.close()
+    return 1, run
+
+
+@benchmark('header_and_check')
+def bench_header_and_check(library):
+    def run():
+        # A new organizer each time so that the metadata cache is cold
+        organizer = lib.InteractiveOrganizer()
+        for file_path in library.files:
+            organizer._header_and_check(file_path, f'{file_path}.{METADATA_EXTENSION}')
+    return len(library.files), run
+
+
+@benchmark('color_tokens_in_string')
+def bench_color_tokens_in_string(library):
+    matcher = lib.TokenMatcher(lib.TOKENS_TO_IGNORE, lib.TOKEN_MIN_LENGTH)
+    cases = []
+    for old_name, new_name in library.names:
+        similar_tokens, missing_tokens = matcher.compare(old_name, new_name)
+        cases.append((old_name, similar_tokens, missing_tokens))
+
+    def run():
+        for old_name, similar_tokens, missing_tokens in cases:
+            old_name_hl = lib.InteractiveOrganizer._color_tokens_in_string(old_name, missing_tokens)
+            lib.InteractiveOrganizer._color_tokens_in_string(old_name_hl, similar_tokens, 'green')
+    return len(cases), run
+
+
+@benchmark('remove_diacritics')
+def bench_remove_diacritics(library):
+    names = [name for pair in library.names for name in pair]
+
+    def run():
+        for name in names:
+            lib.remove_diacritics(name)
+    return len(names), run
+
+
+@benchmark('move_or_link_file_and_maybe_meta')
+def bench_move(library):
+    source_folder = os.path.join(library.tmp_dir, 'move_source')
+    output_folder = os.path.join(library.tmp_dir, 'move_output')
+    files = []
+
+    def setup():
+        # The moved files are generated again (untimed) before each repetition
+        for folder in [source_folder, output_folder]:
+            shutil.rmtree(folder, ignore_errors=True)
+        os.makedirs(output_folder)
+        files[:] = generate_library(source_folder, len(library.files), library.seed)
+
+    def run():
+        organizer = lib.InteractiveOrganizer()
+        for file_path in files:
+            organizer._move_or_link_file_and_maybe_meta(output_folder, file_path,
+                                                        f'{file_path}.{METADATA_EXTENSION}')
+    run.setup = setup
+    return len(library.files), run
+
+
+@benchmark('harvest_isbns')
+def bench_harvest_isbns(library):
+    files = [os.fspath(file_path) for file_path in library.files[:100]]
+
+    def run():
+        # What a worker of the ISBN harvester does for a file without metadata
+        for file_path in files:
+            lib._harvest_isbns_worker(file_path, lib.HARVEST_PAGES, lib.ISBN_DIRECT_FILES, {})
+    return len(files), run
+
+
+class Library:
+    def __init__(self, tmp_dir, number, seed):
+        self.tmp_dir = tmp_dir
+        self.seed = seed
+        self.folder = os.path.join(tmp_dir, 'library')
+        self.files = generate_library(self.folder, number, seed)
+        # (old filename, new filename) of the files with a metadata file
+        self.names = []
+        for file_path in self.files:
+            metadata = lib.MetadataCache().get(f'{file_path}.{METADATA_EXTENSION}')
+            if metadata:
+                old_name = os.path.basename(metadata.fields.get('Old file path', ''))
+                self.names.append((old_name, os.path.basename(file_path)))
+
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, universal_newlines=True,
+                              cwd=os.path.dirname(BIN_DIR)).stdout.strip()
+    except OSError:
+        return ''
+
+
+def run_benchmarks(names, number, repeat, seed):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='interactive_organizer_bench_') as tmp_dir:
+        library = Library(tmp_dir, number, seed)
+        for name in names:
+            items, run = BENCHMARKS[name](library)
+            timings = []
+            setup = getattr(run, 'setup', None)
+            for _ in range(repeat):
+                if setup:
+                    setup()
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+            results[name] = {'items': items, 'repeat': repeat, 'best': min(timings),
+                             'median': statistics.median(timings),
+                             'best_per_item_us': min(timings) / items * 1e6}
+            print(f"{name:<36}{results[name]['best'] * 1000:10.2f} ms "
+                  f"({results[name]['best_per_item_us']:.1f} us/item)")
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline['info'].get('commit') or '?'}):")
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if old:
+            ratio = old['best_per_item_us'] / result['best_per_item_us']
+            print(f'{name:<36}{ratio:8.2f}x ' + ('faster' if ratio >= 1 else 'slower'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--number', type=int, default=2000, help='Number of ebooks in the library.')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Number of runs of each benchmark.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed used to generate the library.')
+    parser.add_argument('-b', '--benchmark', dest='benchmarks', action='append', choices=list(BENCHMARKS),
+                        help='Benchmark to run (can be repeated). By default, all of them are run.')
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help='JSON file for the results.')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON results to compare with.')
+    args = parser.parse_args()
+    os.environ['PATH'] = BIN_DIR + os.pathsep + os.environ.get('PATH', '')
+    results = run_benchmarks(args.benchmarks or list(BENCHMARKS), args.number, args.repeat, args.seed)
+    info = {'commit': get_commit(), 'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0], 'platform': platform.platform(), 'files': args.number}
+    with open(args.output, 'w') as f:
+        json.dump({'info': info, 'results': results}, f, indent=2)
+    print(f"Results saved in '{args.output}'")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
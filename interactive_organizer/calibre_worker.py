@@ -0,0 +1,89 @@
+"""Persistent calibre worker used by the interactive organizer.
+
+It is started once per session with calibre's own interpreter::
+
+   calibre-debug -e calibre_worker.py
+
+and runs calibre's commands (`ebook-meta`, `fetch-ebook-metadata` and
+`ebook-convert`) in-process so that calibre's startup (interpreter, plugins)
+is only paid once.
+
+Protocol: one JSON request per line on stdin, e.g.
+`{"id": 1, "cmd": "ebook-meta", "args": ["book.pdf"]}`, and one JSON response
+per line on stdout, e.g.
+`{"id": 1, "returncode": 0, "stdout": "...", "stderr": ""}`. If the command
+couldn't be run at all, the response has an `error` instead. The `ping`
+command is used as health check. The worker exits when stdin is closed.
+
+NOTE: this script only uses the standard library since it is not run with the
+interpreter where `interactive_organizer` is installed.
+"""
+import importlib
+import json
+import os
+import sys
+import tempfile
+import traceback
+
+# Entry points of calibre's commands (see calibre's `linux.py`)
+ENTRY_POINTS = {
+    'ebook-convert': 'calibre.ebooks.conversion.cli:main',
+    'ebook-meta': 'calibre.ebooks.metadata.cli:main',
+    'fetch-ebook-metadata': 'calibre.ebooks.metadata.sources.cli:main',
+}
+
+
+def run(cmd, args):
+    """Run calibre's command `cmd` and return its returncode, stdout and stderr."""
+    module_name, func_name = ENTRY_POINTS[cmd].split(':')
+    main = getattr(importlib.import_module(module_name), func_name)
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        # NOTE: the file descriptors are redirected since calibre also writes
+        # to them directly (e.g. from its plugins)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved_fds = os.dup(1), os.dup(2)
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+        try:
+            try:
+                returncode = main([cmd] + list(args)) or 0
+            except SystemExit as e:
+                returncode = e.code if isinstance(e.code, int) else int(e.code is not None)
+            except Exception:
+                traceback.print_exc()
+                returncode = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            for fd, saved_fd in zip([1, 2], saved_fds):
+                os.dup2(saved_fd, fd)
+                os.close(saved_fd)
+        out.seek(0)
+        err.seek(0)
+        return returncode, out.read().decode('utf-8', 'replace'), err.read().decode('utf-8', 'replace')
+
+
+def main():
+    # The responses are written on the original stdout (fd 1 is redirected by run())
+    responses = os.fdopen(os.dup(1), 'w', encoding='utf-8')
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        response = {'id': request.get('id'), 'returncode': 0, 'stdout': '', 'stderr': ''}
+        cmd = request.get('cmd')
+        if cmd in ENTRY_POINTS:
+            try:
+                response['returncode'], response['stdout'], response['stderr'] = run(cmd, request.get('args', []))
+            except Exception:
+                # e.g. the entry point is not found in this version of calibre
+                response['error'] = traceback.format_exc()
+        elif cmd != 'ping':
+            response['error'] = f'Unknown command: {cmd}'
+        responses.write(json.dumps(response) + '\n')
+        responses.flush()
+
+
+if __name__ == '__main__':
+    main()
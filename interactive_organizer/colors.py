@@ -0,0 +1,38 @@
+"""Colors of the messages printed by the script.
+
+NOTE: `lib` uses the colors of `organize_ebooks` but the script uses these ones
+so that it can build its parser (e.g. for `--help`) without loading them.
+"""
+# ANSI escape codes
+COLORS = {
+    'b': '\033[0;34m',
+    'bold': '\033[1m',
+    'g': '\033[0;32m',
+    'r': '\033[0;31m',
+    'y': '\033[0;33m',
+    'NC': '\033[0m',
+}
+
+
+def color(msg, msg_color='y'):
+    return f"{COLORS[msg_color]}{msg}{COLORS['NC']}"
+
+
+def blue(msg):
+    return color(msg, 'b')
+
+
+def bold(msg):
+    return color(msg, 'bold')
+
+
+def green(msg):
+    return color(msg, 'g')
+
+
+def red(msg):
+    return color(msg, 'r')
+
+
+def yellow(msg):
+    return color(msg, 'y')
@@ -0,0 +1,125 @@
+"""Default config values of the interactive organizer.
+
+NOTE: they are kept apart from `lib`, which imports `organize_ebooks`, so that
+the script can build its parser (e.g. for `--help`) without loading them.
+`lib` imports all of them.
+"""
+import os
+import time
+
+
+def _get_re_year():
+    # Same as get_re_year() from organize_ebooks: the years from 1900 to the end
+    # of the current decade
+    return f'(19[0-9]|20[0-{time.strftime("%Y")[2]}])[0-9]'
+
+
+# =====================
+# Default config values
+# =====================
+
+# Misc options
+# ============
+DRY_RUN = False
+SYMLINK_ONLY = False
+
+# Logging options
+# ===============
+LOGGING_FORMATTER = 'only_msg'
+LOGGING_LEVEL = 'info'
+
+# Convert-to-txt options
+# ======================
+DJVU_CONVERT_METHOD = 'djvutxt'
+EPUB_CONVERT_METHOD = 'ebook-convert'
+MSWORD_CONVERT_METHOD = 'textutil'
+PDF_CONVERT_METHOD = 'pdftotext'
+
+# Commands of the conversion methods that can write to stdout. Their output is
+# streamed directly into `less` (see stream_to_less())
+STREAM_CONVERT_COMMANDS = {
+    'catdoc': ['catdoc', '{file_path}'],
+    'djvutxt': ['djvutxt', '{file_path}'],
+    'pdftotext': ['pdftotext', '{file_path}', '-'],
+    'textutil': ['textutil', '-convert', 'txt', '-stdout', '{file_path}'],
+}
+
+# Interactive options
+# ===================
+QUICK_MODE = False
+CUSTOM_MOVE_BASE_DIR = ''
+RESTORE_ORIGINAL_BASE_DIR = ''
+# DIACRITIC_DIFFERENCE_MASKINGS = None
+# MATCH_PARTIAL_WORDS = False
+
+BATCH_MODE = False
+BATCH_REPORT = 'batch_report.txt'
+BATCH_WORKERS = os.cpu_count() or 1
+JOURNAL = ''
+RESUME = False
+ONLY = None
+REFRESH_INDEX = False
+# Order in which the files are reviewed: 'scan', 'name' or 'mismatch'
+ORDER = 'scan'
+WATCH = False
+# In seconds
+WATCH_SETTLE = 5
+WATCH_POLL_INTERVAL = 2
+STATS = ''
+PROFILE = ''
+PROFILE_FILENAME = 'interactive_organizer.pstats'
+DUPLICATES = False
+PREFETCH = 8
+PRECONVERT = 0
+TRANSFER_WORKERS = 2
+HASH_WORKERS = 4
+# In bytes, read at the start and at the end of the files of the same size
+HASH_SAMPLE_SIZE = 64 * 1024
+FETCH_WORKERS = 4
+FETCH_TIMEOUT = 60
+# Persistent calibre processes (see calibre_worker.py), 0 starts a new process for each command
+CALIBRE_WORKERS = 0
+CALIBRE_WORKER_CMD = 'calibre-debug -e {script}'
+# In seconds, given to a calibre worker to start and answer its health check
+CALIBRE_WORKER_START_TIMEOUT = 30
+# Failed starts in a row after which a calibre worker is not used anymore
+CALIBRE_WORKER_MAX_STARTS = 3
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                         'interactive_organizer')
+NO_FETCH_CACHE = False
+REFRESH_FETCH_CACHE = False
+# In days
+FETCH_CACHE_TTL = 30
+# In days, for the sources that found nothing
+FETCH_CACHE_NEGATIVE_TTL = 1
+FETCH_CACHE_SIZE = 10000
+# In MiB
+CONVERSION_CACHE_SIZE = 1024
+HARVEST_ISBNS = 0
+# Number of pages converted at the start and at the end of a file
+HARVEST_PAGES = 5
+ISBN_CACHE_SIZE = 10000
+EBOOK_META_CACHE_SIZE = 10000
+PRELOAD_EBOOK_META = 0
+METADATA_CACHE_SIZE = 4096
+# Options related to extracting and searching for non-ISBN metadata
+# =================================================================
+TOKEN_MIN_LENGTH = 3
+# NOTE: Structured -> Structur (ed removed because 'ed(ition)?')
+# Thus, '^' before and '$' after 'ed(ition)'. ed not counted as ed(ition) in Structured
+TOKENS_TO_IGNORE = f'ebook|book|novel|series|^ed(ition)?$|^vol(ume)?$|{_get_re_year()}'
+ISBN_METADATA_FETCH_ORDER = ['Goodreads', 'Google', 'Amazon.com', 'ISBNDB', 'WorldCat xISBN', 'OZON.ru']
+ORGANIZE_WITHOUT_ISBN_SOURCES = ['Goodreads', 'Google', 'Amazon.com']
+
+# ====================
+# Input/Output options
+# ====================
+SCAN_WORKERS = 8
+OUTPUT_METADATA_EXTENSION = 'meta'
+OUTPUT_FILENAME_TEMPLATE = "${d[AUTHORS]// & /, } - ${d[SERIES]:+[${d[SERIES]}] " \
+                           "- }${d[TITLE]/:/ -}${d[PUBLISHED]:+ (${d[PUBLISHED]%%-*})}" \
+                           "${d[ISBN]:+ [${d[ISBN]}]}.${d[EXT]}"
+
+# Result of InteractiveOrganizer._check_file()
+# code: 1 (no metadata), 2 (missing tokens) or 3 (no missing tokens)
+CHECK_STATUSES = {1: 'no-metadata', 2: 'missing', 3: 'clean'}
@@ -6,18 +6,22 @@ shell by `na--`.
 Ref.: https://github.com/na--/ebook-tools
 """
 import glob
+import json
 import logging
+import math
 import os
-import platform
-import readline
+import signal
 import sys
-import termios
-import tty
+import threading
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from functools import lru_cache, partial
 from pathlib import Path
 from textwrap import wrap
 from unicodedata import combining, normalize
 
 from organize_ebooks.lib import *
+from interactive_organizer.defaults import *
 # TODO
 from interactive_organizer import __version__
 # __version__ = '0.1.0'
@@ -30,55 +34,15 @@ logger.setLevel(logging.CRITICAL + 1)
 LATIN = "ä  æ  ǽ  đ ð ƒ ħ ı ł ø ǿ ö  œ  ß  ŧ ü "
 ASCII = "ae ae ae d d f h i l o o oe oe ss t ue"
 
-# =====================
-# Default config values
-# =====================
-
-# Misc options
-# ============
-DRY_RUN = False
-SYMLINK_ONLY = False
-
-# Logging options
-# ===============
-LOGGING_FORMATTER = 'only_msg'
-LOGGING_LEVEL = 'info'
-
-# Convert-to-txt options
-# ======================
-DJVU_CONVERT_METHOD = 'djvutxt'
-EPUB_CONVERT_METHOD = 'ebook-convert'
-MSWORD_CONVERT_METHOD = 'textutil'
-PDF_CONVERT_METHOD = 'pdftotext'
-
-# Interactive options
-# ===================
-QUICK_MODE = False
-CUSTOM_MOVE_BASE_DIR = ''
-RESTORE_ORIGINAL_BASE_DIR = ''
-# DIACRITIC_DIFFERENCE_MASKINGS = None
-# MATCH_PARTIAL_WORDS = False
-
-# Options related to extracting and searching for non-ISBN metadata
-# =================================================================
-TOKEN_MIN_LENGTH = 3
-# NOTE: Structured -> Structur (ed removed because 'ed(ition)?')
-# Thus, '^' before and '$' after 'ed(ition)'. ed not counted as ed(ition) in Structured
-TOKENS_TO_IGNORE = f'ebook|book|novel|series|^ed(ition)?$|^vol(ume)?$|{get_re_year()}'
-ISBN_METADATA_FETCH_ORDER = ['Goodreads', 'Google', 'Amazon.com', 'ISBNDB', 'WorldCat xISBN', 'OZON.ru']
-ORGANIZE_WITHOUT_ISBN_SOURCES = ['Goodreads', 'Google', 'Amazon.com']
-
-# ====================
-# Input/Output options
-# ====================
-OUTPUT_FILENAME_TEMPLATE = "${d[AUTHORS]// & /, } - ${d[SERIES]:+[${d[SERIES]}] " \
-                           "- }${d[TITLE]/:/ -}${d[PUBLISHED]:+ (${d[PUBLISHED]%%-*})}" \
-                           "${d[ISBN]:+ [${d[ISBN]}]}.${d[EXT]}"
-
 
 # Ref.: https://stackoverflow.com/a/510404
 def getch():
     """Gets a single character from standard input. Does not echo to the screen."""
+    # NOTE: the terminal modules (and the other heavy ones) are only imported when
+    # needed so that the script starts quickly, e.g. for `--help`
+    import termios
+    import tty
+
     fd = sys.stdin.fileno()
     old_settings = termios.tcgetattr(fd)
     try:
@@ -94,6 +58,77 @@ def less(file_path):
     return 0
 
 
+def stream_to_less(cmd, output_file=None, on_finished=None):
+    """Run the conversion command `cmd` and show its output with `less` as it is written.
+
+    If `output_file` is given, the output is also saved in it. If `less` is quit
+    before the end of the conversion, the conversion is stopped unless
+    `on_finished` is given: it then continues in the background and
+    `on_finished` is called with its `CompletedProcess` at the end. Return the
+    `CompletedProcess` of the conversion (its `returncode` is None if it
+    continues in the background) or None if it couldn't be started.
+    """
+    stderr_file = tempfile.TemporaryFile()
+    try:
+        converter = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+    except OSError as e:
+        logger.debug(f"Couldn't start '{cmd[0]}': {e}")
+        stderr_file.close()
+        return None
+    try:
+        tty_out = open('/dev/tty', 'wb')
+    except OSError:
+        tty_out = None
+    # NOTE: less reads the keys from /dev/tty since its stdin is the pipe
+    pager = subprocess.Popen(['less'], stdin=subprocess.PIPE, stdout=tty_out)
+
+    def pump():
+        to_pager = True
+        out = open(output_file, 'wb') if output_file else None
+        try:
+            while True:
+                chunk = os.read(converter.stdout.fileno(), 65536)
+                if not chunk:
+                    break
+                if out:
+                    out.write(chunk)
+                if to_pager:
+                    try:
+                        pager.stdin.write(chunk)
+                        pager.stdin.flush()
+                    except (BrokenPipeError, ValueError):
+                        to_pager = False
+        finally:
+            if out:
+                out.close()
+            try:
+                pager.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def wait():
+        pump_thread.join()
+        returncode = converter.wait()
+        converter.stdout.close()
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors='replace')
+        stderr_file.close()
+        return subprocess.CompletedProcess(cmd, returncode, None, stderr)
+
+    pump_thread = threading.Thread(target=pump, daemon=True)
+    pump_thread.start()
+    pager.wait()
+    if tty_out:
+        tty_out.close()
+    if converter.poll() is None:
+        # less was quit before the end of the conversion
+        if on_finished:
+            threading.Thread(target=lambda: on_finished(wait()), daemon=True).start()
+            return subprocess.CompletedProcess(cmd, None)
+        converter.kill()
+    return wait()
+
+
 def open_document(file_path):
     # Command to open the config file with the default application in the
     # OS or the user-specified app, e.g. `open filepath` in macOS opens the
@@ -103,34 +138,100 @@ def open_document(file_path):
                 'Windows': f'cmd /c start "" "{file_path}"'}
     # NOTE: check https://bit.ly/31htaOT (pymotw) for output from
     # platform.system on three OSes
+    import platform
     cmd = cmd_dict.get(platform.system())
     args = shlex.split(cmd)
     result = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     return convert_result_from_shell_cmd(result)
 
 
+def get_convert_method(mime_type, djvu_convert_method=DJVU_CONVERT_METHOD,
+                       epub_convert_method=EPUB_CONVERT_METHOD,
+                       msword_convert_method=MSWORD_CONVERT_METHOD,
+                       pdf_convert_method=PDF_CONVERT_METHOD, **kwargs):
+    """Return the conversion method that `convert_to_txt` uses for `mime_type`."""
+    mime_type = mime_type or ''
+    if mime_type.startswith('image/vnd.djvu'):
+        return djvu_convert_method
+    elif mime_type.startswith('application/epub+zip'):
+        return epub_convert_method
+    elif mime_type == 'application/msword':
+        return msword_convert_method
+    elif mime_type == 'application/pdf':
+        return pdf_convert_method
+    return 'ebook-convert'
+
+
 def open_with_less(file_path, isbn_direct_files=ISBN_DIRECT_FILES,
                    djvu_convert_method=DJVU_CONVERT_METHOD,
                    epub_convert_method=EPUB_CONVERT_METHOD,
                    msword_convert_method=MSWORD_CONVERT_METHOD,
-                   pdf_convert_method=PDF_CONVERT_METHOD, **kwargs):
+                   pdf_convert_method=PDF_CONVERT_METHOD, conversion_cache=None, calibre_pool=None, **kwargs):
     func_params = locals().copy()
     func_params.pop('file_path')
+    func_params.pop('conversion_cache')
+    func_params.pop('calibre_pool')
     mime_type = get_mime_type(file_path)
     logger.info(f"Reading '{file_path}' ({mime_type}) with less...")
     if mime_type and re.match(isbn_direct_files, mime_type):
         result = less(file_path)
         # logger.info(result.stdout)
         return 0
-    tmp_file_txt = tempfile.mkstemp(suffix='.txt')[1]
+    convert_method = get_convert_method(mime_type, **func_params)
+    if conversion_cache:
+        cached_file_txt = conversion_cache.get(file_path, convert_method)
+        if cached_file_txt:
+            logger.debug(f"Text conversion found in cache: {cached_file_txt}")
+            metrics.count('conversion_cache_hits')
+            less(cached_file_txt)
+            return 0
+        tmp_file_txt = conversion_cache.reserve(file_path, convert_method)
+    else:
+        tmp_file_txt = tempfile.mkstemp(suffix='.txt')[1]
+    if convert_method in STREAM_CONVERT_COMMANDS:
+        cmd = [arg.format(file_path=file_path) for arg in STREAM_CONVERT_COMMANDS[convert_method]]
+        logger.debug(f"Streaming the conversion to text into less: {cmd}")
+
+        def finish_in_cache(result):
+            # The conversion continued in the background after less was quit
+            if result.returncode == 0:
+                logger.debug(f"Text conversion saved in cache: {conversion_cache.commit(tmp_file_txt)}")
+            else:
+                remove_file(tmp_file_txt)
+
+        result = stream_to_less(cmd, tmp_file_txt if conversion_cache else None,
+                                finish_in_cache if conversion_cache else None)
+        if result:
+            if result.returncode is None:
+                # Still converting into the cache
+                return 0
+            elif result.returncode == 0 and conversion_cache:
+                conversion_cache.commit(tmp_file_txt)
+                return 0
+            elif result.returncode > 0:
+                logger.error(red('There was an error converting the ebook to txt format:'))
+                logger.error(red(result.stderr))
+            # NOTE: negative returncode if less was quit before the end of the conversion (no cache)
+            remove_file(tmp_file_txt)
+            return 0
+        # Converter not found, falling back to convert_to_txt()
     logger.debug(f"Converting ebook to text format...")
     logger.debug(f"Temp file: {tmp_file_txt}")
-    result = convert_to_txt(file_path, tmp_file_txt, mime_type, **func_params)
+    with metrics.timer('convert'):
+        result = None
+        if calibre_pool and convert_method == 'ebook-convert':
+            result = convert_with_calibre_pool(calibre_pool, file_path, tmp_file_txt)
+        if result is None:
+            result = convert_to_txt(file_path, tmp_file_txt, mime_type, **func_params)
     if result.returncode == 0:
         logger.debug('Conversion to text was successful')
+        if conversion_cache:
+            tmp_file_txt = conversion_cache.commit(tmp_file_txt)
         # TODO: check returncode or stderr
         result = less(tmp_file_txt)
         # logger.info(result.stdout)
+        if conversion_cache:
+            return 0
     else:
         logger.error(red('There was an error converting the ebook to txt format:'))
         logger.error(red(result.stderr))
@@ -155,8 +256,1987 @@ def remove_diacritics(s, outliers=str.maketrans(dict(zip(LATIN.split(), ASCII.sp
     return "".join(c for c in normalize("NFD", s.lower().translate(outliers)) if not combining(c))
 
 
+def highlight_tokens(s, token_colors, year=None):
+    """Color the tokens of `s` in a single pass.
+
+    `token_colors` maps each token to the color code (e.g. `COLORS['RED']`) used
+    for its whole-word occurrences in `s`. All the occurrences of `year` (if
+    any) are colored blue.
+    """
+    alternatives = []
+    if token_colors:
+        # Longest tokens first and escaped since they are matched as literal text
+        tokens = sorted(token_colors, key=len, reverse=True)
+        alternatives.append(r'(?<![^\W\d_])(?P<token>{})(?![^\W\d_])'.format(
+            '|'.join(map(re.escape, tokens))))
+    if year:
+        alternatives.append(f'(?P<year>{re.escape(year)})')
+    if not alternatives:
+        return s
+
+    def color_sub(match):
+        if match.lastgroup == 'year':
+            return blue(match.group())
+        return f"{token_colors[match.group()]}{match.group()}{COLORS['NC']}"
+
+    return re.sub('|'.join(alternatives), color_sub, s)
+
+
+@lru_cache(maxsize=2**16)
+def normalize_token(token):
+    """Cached `remove_diacritics(token.lower())` used when comparing filename tokens."""
+    return remove_diacritics(token.lower())
+
+
+@lru_cache(maxsize=8)
+def get_token_matcher(tokens_to_ignore=TOKENS_TO_IGNORE, token_min_length=TOKEN_MIN_LENGTH):
+    return TokenMatcher(tokens_to_ignore, token_min_length)
+
+
+class TokenMatcher:
+    """Compare the tokens of an old filename with those of a new filename.
+
+    The `tokens_to_ignore` regex and the year regex are compiled once. Each token
+    is normalized only once (see :func:`normalize_token`) and the old tokens are
+    looked up in an index built from the normalized new tokens.
+    """
+    def __init__(self, tokens_to_ignore=TOKENS_TO_IGNORE, token_min_length=TOKEN_MIN_LENGTH):
+        self.tokens_to_ignore = tokens_to_ignore
+        self.token_min_length = token_min_length
+        self.re_ignore = re.compile(tokens_to_ignore, re.MULTILINE)
+        self.re_year = re.compile(get_re_year())
+
+    def compare(self, old_name, new_name):
+        """Return the sets of old tokens that are similar and missing in `new_name`.
+
+        An old token is similar if its normalized form is contained in one of
+        the normalized new tokens. Old tokens shorter than `token_min_length`
+        are neither similar nor missing.
+        """
+        old_tokens = self.tokenize(old_name)
+        new_tokens = [normalize_token(token) for token in self.tokenize(new_name)]
+        new_set = set(new_tokens)
+        # NOTE: normalized tokens only contain letters, thus a match in the joined
+        # string can't span two tokens
+        new_index = '\0'.join(new_tokens)
+        similar_tokens = set()
+        missing_tokens = set()
+        for old_token in old_tokens:
+            cleaned_old_token = normalize_token(old_token)
+            if len(cleaned_old_token) >= self.token_min_length:
+                if new_tokens and (cleaned_old_token in new_set or cleaned_old_token in new_index):
+                    similar_tokens.add(old_token)
+                else:
+                    missing_tokens.add(old_token)
+        return similar_tokens, missing_tokens
+
+    def highlight(self, name, similar_tokens, missing_tokens):
+        """Color `name` with the missing tokens in red, the similar ones in green
+        and the first year found (and its repetitions) in blue."""
+        token_colors = dict.fromkeys(similar_tokens, COLORS['GREEN'])
+        token_colors.update(dict.fromkeys(missing_tokens, COLORS['RED']))
+        match = self.re_year.search(name)
+        if not match:
+            logger.debug('No year found in old filename')
+        return highlight_tokens(name, token_colors, match.group() if match else None)
+
+    def tokenize(self, filename):
+        # old_tokens = re.findall(r"[^\W\d_]+|\d+", old_name_sub)
+        return re.findall(r"[^\W\d_]+", self.re_ignore.sub('', Path(filename).stem))
+
+
+def score_mismatches(names, tokens_to_ignore=TOKENS_TO_IGNORE, token_min_length=TOKEN_MIN_LENGTH):
+    """Count the missing words of many `(old filename, new filename)` pairs at once.
+
+    Return a list of `(missing, significant)` per pair: the number of distinct
+    (normalized) words of the old filename that are missing from the new one,
+    as :meth:`TokenMatcher.compare` finds them, and the number of words of the
+    old filename that are compared.
+
+    All the names are tokenized once and their words mapped to integer ids; the
+    lookups of the old words in the new names are then done for all the pairs
+    at once with NumPy (if installed, otherwise with Python sets).
+    """
+    matcher = get_token_matcher(tokens_to_ignore, token_min_length)
+    ids = {}
+    # Parallel lists: pair index, word id and word of each significant old word
+    old_pairs, old_ids, old_words = [], [], []
+    new_pairs, new_ids = [], []
+    new_indexes = []
+    for i, (old_name, new_name) in enumerate(names):
+        new_words = [normalize_token(token) for token in matcher.tokenize(new_name)]
+        for word in new_words:
+            new_pairs.append(i)
+            new_ids.append(ids.setdefault(word, len(ids)))
+        new_indexes.append('\0'.join(new_words))
+        for token in matcher.tokenize(old_name):
+            word = normalize_token(token)
+            if len(word) >= token_min_length:
+                old_pairs.append(i)
+                old_ids.append(ids.setdefault(word, len(ids)))
+                old_words.append(word)
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    if np is None:
+        new_keys = set(zip(new_pairs, new_ids))
+        old_keys = list(zip(old_pairs, old_ids))
+        # NOTE: partial matches (e.g. 'structur' in 'structures') are looked for in the joined new words
+        missing_keys = {key for key, word in zip(old_keys, old_words)
+                        if key not in new_keys and word not in new_indexes[key[0]]}
+        missing = [0] * len(names)
+        significant = [0] * len(names)
+        for i, _ in missing_keys:
+            missing[i] += 1
+        for i, _ in set(old_keys):
+            significant[i] += 1
+        return list(zip(missing, significant))
+    # A key identifies a word in a given pair
+    vocabulary_size = max(len(ids), 1)
+    old_keys = np.asarray(old_pairs, dtype=np.int64) * vocabulary_size + np.asarray(old_ids, dtype=np.int64)
+    new_keys = np.asarray(new_pairs, dtype=np.int64) * vocabulary_size + np.asarray(new_ids, dtype=np.int64)
+    found = np.isin(old_keys, new_keys)
+    # NOTE: partial matches (e.g. 'structur' in 'structures') are only looked for in the remaining words
+    for k in np.flatnonzero(~found):
+        found[k] = old_words[k] in new_indexes[old_pairs[k]]
+    missing = np.bincount(np.unique(old_keys[~found]) // vocabulary_size, minlength=len(names))
+    significant = np.bincount(np.unique(old_keys) // vocabulary_size, minlength=len(names))
+    return list(zip(missing.tolist(), significant.tolist()))
+
+
+class FileRecord:
+    """Compact record of a file found by :func:`scan_folder`.
+
+    The folder string is interned, i.e. shared by all the files of a folder, and
+    the size, mtime and presence of a metadata file are those found when the
+    folder was scanned. A record can be used wherever a path is expected
+    (`os.fspath`, `str`, `Path(record)`) and the result of its check is saved in
+    it along with the settings used (see `InteractiveOrganizer._check_key`).
+    """
+    __slots__ = ('dir', 'name', 'size', 'mtime_ns', 'has_metadata', 'check_key', 'check_result')
+
+    def __init__(self, dir_path, name, size=-1, mtime_ns=-1, has_metadata=False):
+        self.dir = sys.intern(dir_path)
+        self.name = name
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.has_metadata = has_metadata
+        self.check_key = None
+        self.check_result = None
+
+    def __eq__(self, other):
+        if isinstance(other, (str, os.PathLike)):
+            return os.fspath(self) == os.fspath(other)
+        return NotImplemented
+
+    def __fspath__(self):
+        return os.path.join(self.dir, self.name)
+
+    def __hash__(self):
+        return hash(os.fspath(self))
+
+    def __repr__(self):
+        return f'FileRecord({os.fspath(self)!r})'
+
+    def __str__(self):
+        return os.fspath(self)
+
+
+def _scan_dir(dir_path, ignored_extension):
+    files = []
+    subdirs = []
+    names = set()
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                names.add(entry.name)
+                try:
+                    # NOTE: symlinked folders are not followed (like Path.rglob) so that
+                    # no file outside the input folder is reviewed
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    # Ignore hidden files and metadata files
+                    elif entry.is_file() and not entry.name.startswith('.') and \
+                            not entry.name.endswith(ignored_extension):
+                        stat = entry.stat()
+                        files.append(FileRecord(dir_path, entry.name, stat.st_size, stat.st_mtime_ns))
+                except OSError as e:
+                    logger.debug(f"Couldn't stat '{entry.path}': {e}")
+    except OSError as e:
+        logger.warning(yellow(f"Couldn't scan folder '{dir_path}': {e}"))
+    for record in files:
+        record.has_metadata = f'{record.name}.{ignored_extension}' in names
+    files.sort(key=lambda x: x.name)
+    subdirs.sort()
+    return files, subdirs
+
+
+def scan_folder(folder_path, ignored_extension=OUTPUT_METADATA_EXTENSION, workers=SCAN_WORKERS):
+    """Recursively yield the files found in `folder_path` (as :class:`FileRecord`)
+    as soon as they are scanned.
+
+    Each directory is listed with `os.scandir` in a thread pool and the sub-folders
+    are queued as soon as their parent is listed, so the first files can be
+    yielded before the walk of the whole tree is finished.
+
+    The order is deterministic: the files of a folder are yielded sorted by name
+    followed by its sub-folders in sorted order (depth-first). NOTE: the files are
+    thus not sorted by name across the folders (see `--order name`).
+
+    Symlinked folders are not followed. Hidden files and files ending with
+    `ignored_extension` are skipped.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    # Stack of iterators over the (already submitted) scans of sibling folders
+    stack = [iter([pool.submit(_scan_dir, folder_path, ignored_extension)])]
+    try:
+        while stack:
+            future = next(stack[-1], None)
+            if future is None:
+                stack.pop()
+                continue
+            files, subdirs = future.result()
+            # Submit the sub-folders before yielding so they are scanned in the
+            # background while the files of this folder are being reviewed
+            stack.append(iter([pool.submit(_scan_dir, d, ignored_extension) for d in subdirs]))
+            yield from files
+    finally:
+        for it in stack:
+            for future in it:
+                future.cancel()
+        pool.shutdown(wait=False)
+
+
+class Metrics:
+    """Timers and counters of the phases of a session (e.g. scan, fetch, move).
+
+    All the durations of a phase are kept so that their percentiles can be
+    computed at the end of the session. Nothing is recorded unless `enabled`
+    is True. Recording is thread-safe since most phases also run in background
+    threads.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._durations = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._start = time.time()
+
+    @staticmethod
+    def _percentile(sorted_values, percent):
+        # Nearest-rank method
+        return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+    def add(self, phase, seconds):
+        if self.enabled:
+            with self._lock:
+                self._durations.setdefault(phase, []).append(seconds)
+
+    def count(self, counter, value=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._counters.clear()
+            self._start = time.time()
+
+    def summary(self):
+        """Return the calls, total, p50, p95 and max (in seconds) of each phase and the counters."""
+        with self._lock:
+            durations = {phase: sorted(values) for phase, values in self._durations.items()}
+            counters = dict(self._counters)
+        phases = {}
+        for phase, values in sorted(durations.items()):
+            phases[phase] = {'calls': len(values), 'total': sum(values), 'p50': self._percentile(values, 50),
+                             'p95': self._percentile(values, 95), 'max': values[-1]}
+        return {'session_seconds': time.time() - self._start, 'phases': phases, 'counters': counters}
+
+    def timed_iter(self, phase, iterable):
+        """Yield the items of `iterable`, the time taken to get each of them is counted in `phase`."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add(phase, time.perf_counter() - start)
+            yield item
+
+    @contextmanager
+    def timer(self, phase):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def to_prometheus(self, summary=None):
+        """Return the metrics in the Prometheus text format."""
+        summary = summary or self.summary()
+        lines = ['# HELP interactive_organizer_phase_seconds Time spent in the phases of the session.',
+                 '# TYPE interactive_organizer_phase_seconds summary']
+        for phase, stats in summary['phases'].items():
+            for quantile, key in [('0.5', 'p50'), ('0.95', 'p95')]:
+                lines.append(f'interactive_organizer_phase_seconds{{phase="{phase}",quantile="{quantile}"}} '
+                             f'{stats[key]:.6f}')
+            lines.append(f'interactive_organizer_phase_seconds_sum{{phase="{phase}"}} {stats["total"]:.6f}')
+            lines.append(f'interactive_organizer_phase_seconds_count{{phase="{phase}"}} {stats["calls"]}')
+        lines += ['# HELP interactive_organizer_phase_max_seconds Longest call of each phase of the session.',
+                  '# TYPE interactive_organizer_phase_max_seconds gauge']
+        lines += [f'interactive_organizer_phase_max_seconds{{phase="{phase}"}} {stats["max"]:.6f}'
+                  for phase, stats in summary['phases'].items()]
+        lines += ['# HELP interactive_organizer_events_total Events counted during the session (e.g. cache hits).',
+                  '# TYPE interactive_organizer_events_total counter']
+        lines += [f'interactive_organizer_events_total{{event="{counter}"}} {value}'
+                  for counter, value in sorted(summary['counters'].items())]
+        lines += ['# HELP interactive_organizer_session_seconds Duration of the session.',
+                  '# TYPE interactive_organizer_session_seconds gauge',
+                  f'interactive_organizer_session_seconds {summary["session_seconds"]:.3f}']
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write the metrics in `path`: in the Prometheus text format if it ends
+        with `.prom`, as JSON otherwise."""
+        summary = self.summary()
+        with open(path, 'w') as f:
+            if path.endswith('.prom'):
+                f.write(self.to_prometheus(summary))
+            else:
+                json.dump(summary, f, indent=2)
+                f.write('\n')
+
+
+# Timers and counters of the current session
+metrics = Metrics()
+
+
+# Result of InteractiveOrganizer._check_file()
+# code: see CHECK_STATUSES
+CheckResult = namedtuple('CheckResult', ['filename', 'file_size', 'folder', 'has_metadata',
+                                         'old_name_hl', 'missing_tokens', 'code'])
+
+
+class HeaderPrefetcher:
+    """Compute the header results of the upcoming files in a background thread.
+
+    `check_func(file_path, metadata_path)` is run for each scheduled file and its
+    result is kept until it is taken or discarded. A result is only returned if
+    it was computed with the same `key` (i.e. the same settings) as the one used
+    when taking it.
+    """
+    def __init__(self, check_func, metadata_extension, on_result=None):
+        self._check_func = check_func
+        self._metadata_extension = metadata_extension
+        # Called with the file path and its result once it is computed
+        self._on_result = on_result
+        self._futures = {}
+        self._lock = threading.Lock()
+        from concurrent.futures import ThreadPoolExecutor
+        self._pool = ThreadPoolExecutor(max_workers=1)
+
+    def _run(self, file_path):
+        try:
+            result = self._check_func(file_path, f'{file_path}.{self._metadata_extension}')
+            if self._on_result:
+                self._on_result(file_path, result)
+            return result
+        except Exception as e:
+            # The header will be computed again (and the error shown) when the file is reviewed
+            logger.debug(f"Couldn't prefetch the header of '{file_path}': {e}")
+            return None
+
+    def clear(self):
+        with self._lock:
+            for _, future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+
+    def discard(self, file_path):
+        with self._lock:
+            entry = self._futures.pop(str(file_path), None)
+        if entry:
+            entry[1].cancel()
+
+    def schedule(self, file_path, key):
+        with self._lock:
+            if str(file_path) not in self._futures:
+                self._futures[str(file_path)] = (key, self._pool.submit(self._run, file_path))
+
+    def shutdown(self):
+        self.clear()
+        self._pool.shutdown(wait=False)
+
+    def take(self, file_path, key):
+        with self._lock:
+            entry = self._futures.pop(str(file_path), None)
+        if entry is None or entry[0] != key:
+            return None
+        return entry[1].result()
+
+
+def file_identity(file_path):
+    """Return a key that identifies the content of `file_path`: its device, inode,
+    size and mtime. It doesn't change when the file is renamed or moved within
+    the same filesystem."""
+    stat = os.stat(file_path)
+    return f'{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}'
+
+
+class SqliteCache:
+    """Persistent key/value cache stored in a table of a SQLite database.
+
+    Entries older than `ttl` seconds are ignored and, when there are more than
+    `max_entries` entries, the least recently used ones are evicted. It can be
+    shared between threads.
+    """
+    table = 'cache'
+
+    def __init__(self, db_path, ttl=None, max_entries=None):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        import sqlite3
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS {self.table} '
+                               '(key TEXT PRIMARY KEY, value TEXT, created REAL, used REAL)')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+    def get(self, key, ttl=None):
+        """Return the cached value of `key` or None if it isn't cached (or expired).
+
+        If `ttl` is given, it is used instead of the TTL of the cache.
+        """
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock, self._conn:
+            row = self._conn.execute(f'SELECT value, created FROM {self.table} WHERE key = ?',
+                                     (key,)).fetchone()
+            if row is None:
+                return None
+            if ttl is not None and now - row[1] > ttl:
+                self._conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+                return None
+            self._conn.execute(f'UPDATE {self.table} SET used = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(f'INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)',
+                               (key, value, now, now))
+            if self.max_entries is not None:
+                # Keep the `max_entries` most recently used entries
+                self._conn.execute(f'DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} '
+                                   'ORDER BY used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+
+class FetchCache(SqliteCache):
+    """Cache of the metadata fetched with `fetch-ebook-metadata`.
+
+    Entries are keyed by source and query (ISBN or normalized title, see
+    :meth:`query_key`). An empty value means that the source found nothing: it
+    is only kept for `negative_ttl_days` since the source might find something
+    later (e.g. a new book).
+    """
+    table = 'fetch'
+
+    def __init__(self, db_path, ttl_days=FETCH_CACHE_TTL, max_entries=FETCH_CACHE_SIZE,
+                 negative_ttl_days=FETCH_CACHE_NEGATIVE_TTL):
+        super().__init__(db_path, ttl_days * 24 * 3600, max_entries)
+        self.negative_ttl = min(negative_ttl_days, ttl_days) * 24 * 3600
+
+    @staticmethod
+    def query_key(isbn='', title=''):
+        if isbn:
+            return f'isbn:{isbn}'
+        return 'title:' + ' '.join(remove_diacritics(title).split())
+
+    def get_metadata(self, source, query):
+        metadata = self.get(f'{source}\t{query}')
+        if metadata == '':
+            return self.get(f'{source}\t{query}', self.negative_ttl)
+        return metadata
+
+    def set_metadata(self, source, query, metadata):
+        self.set(f'{source}\t{query}', metadata)
+
+
+class CalibreWorker:
+    """Persistent calibre process that runs calibre's commands (`ebook-meta`,
+    `fetch-ebook-metadata` and `ebook-convert`) without starting a new
+    interpreter each time (see :mod:`interactive_organizer.calibre_worker`).
+
+    The process is checked with a `ping` request before its first use and it is
+    started again if it exits (e.g. after a crash or a timeout). After
+    `max_starts` failed starts in a row, it isn't used anymore. It must only be
+    used by one thread at a time (see :class:`CalibreWorkerPool`).
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calibre_worker.py')
+
+    def __init__(self, cmd=CALIBRE_WORKER_CMD, start_timeout=CALIBRE_WORKER_START_TIMEOUT,
+                 max_starts=CALIBRE_WORKER_MAX_STARTS):
+        self.cmd = cmd
+        self.start_timeout = start_timeout
+        self.max_starts = max_starts
+        self.failed_starts = 0
+        self._proc = None
+        self._responses = None
+        self._ready = False
+        self._request_id = 0
+
+    @staticmethod
+    def _read(proc, responses):
+        for line in proc.stdout:
+            responses.put(line)
+        # The process exited
+        responses.put(None)
+
+    def _request(self, cmd, args, timeout=None):
+        # Return the response to the request or None if the process exited
+        import queue
+        self._request_id += 1
+        try:
+            self._proc.stdin.write(json.dumps({'id': self._request_id, 'cmd': cmd, 'args': args}) + '\n')
+            self._proc.stdin.flush()
+        except OSError:
+            self.stop(kill=True)
+            return None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                line = self._responses.get(timeout=None if deadline is None else max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                self.stop(kill=True)
+                raise subprocess.TimeoutExpired([cmd] + args, timeout)
+            if line is None:
+                self.stop(kill=True)
+                return None
+            try:
+                response = json.loads(line)
+            except ValueError:
+                # e.g. printed by calibre-debug itself
+                continue
+            if response.get('id') == self._request_id:
+                return response
+
+    def _ensure_started(self):
+        # Return True if the worker is running and answered its health check
+        if self._proc and self._proc.poll() is None and self._ready:
+            return True
+        if self._proc is None or self._proc.poll() is not None:
+            self.start()
+            if self._proc is None:
+                return False
+        try:
+            response = self._request('ping', [], self.start_timeout)
+        except subprocess.TimeoutExpired:
+            response = None
+        if response is None or 'error' in response:
+            self.failed_starts += 1
+            logger.debug(f'The calibre worker failed its health check ({self.failed_starts} failed starts)')
+            self.stop(kill=True)
+            return False
+        self.failed_starts = 0
+        self._ready = True
+        return True
+
+    def run(self, cmd, args, timeout=None):
+        """Run calibre's command `cmd` (e.g. 'ebook-meta') with `args` in the worker.
+
+        Return a `CompletedProcess` or None if the worker couldn't run it, in which
+        case the command should be run in a new process as usual. If it takes more
+        than `timeout` seconds, the worker is killed and `TimeoutExpired` is raised.
+        """
+        if not self._ensure_started():
+            return None
+        response = self._request(cmd, list(args), timeout)
+        if response is None or 'error' in response:
+            logger.debug(f"The calibre worker couldn't run {cmd}: "
+                         f"{response['error'] if response else 'the worker exited'}")
+            return None
+        metrics.count('calibre_worker_requests')
+        return subprocess.CompletedProcess([cmd] + list(args), response['returncode'], response['stdout'],
+                                           response['stderr'])
+
+    def kill(self):
+        """Kill the worker process, e.g. from another thread to cancel the command that
+        it is running. It is started again before its next use."""
+        proc = self._proc
+        if proc:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def start(self):
+        """Start the worker process (its health check is done before its first use)."""
+        import queue
+        self.stop(kill=True)
+        if self.failed_starts >= self.max_starts:
+            return
+        cmd = [arg.format(script=self.script) for arg in shlex.split(self.cmd)]
+        logger.debug(f'Starting a calibre worker: {cmd}')
+        metrics.count('calibre_worker_starts')
+        try:
+            # New session so that the whole process group can be killed
+            self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                          stderr=subprocess.DEVNULL, encoding='utf-8', errors='replace',
+                                          start_new_session=True)
+        except OSError as e:
+            self.failed_starts += 1
+            logger.debug(f"Couldn't start the calibre worker: {e}")
+            return
+        self._responses = queue.Queue()
+        threading.Thread(target=self._read, args=(self._proc, self._responses), daemon=True).start()
+
+    def stop(self, kill=False):
+        proc, self._proc = self._proc, None
+        self._ready = False
+        if proc is None:
+            return
+        try:
+            # The worker exits when its stdin is closed
+            proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            proc.wait(timeout=0 if kill else 2)
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            proc.wait()
+
+
+class CalibreWorkerPool:
+    """Persistent calibre workers (see :class:`CalibreWorker`) shared by the threads
+    of the organizer.
+
+    A command is only run in a worker if one is idle: otherwise, or if the workers
+    can't be started, :meth:`run` returns None and the command should be run in a
+    new process as usual.
+    """
+    def __init__(self, workers, cmd=CALIBRE_WORKER_CMD, start_timeout=CALIBRE_WORKER_START_TIMEOUT):
+        import queue
+        self._workers = [CalibreWorker(cmd, start_timeout) for _ in range(workers)]
+        self._idle = queue.Queue()
+        for worker in self._workers:
+            # NOTE: started right away so that calibre is ready when it is first needed
+            worker.start()
+            self._idle.put(worker)
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
+
+    def run(self, cmd, args, timeout=None):
+        """Run calibre's command `cmd` in an idle worker (see :meth:`CalibreWorker.run`)."""
+        with self.worker() as worker:
+            return worker.run(cmd, args, timeout) if worker else None
+
+    @contextmanager
+    def worker(self):
+        """Reserve an idle worker (None if there is none) for the duration of the block."""
+        import queue
+        try:
+            worker = self._idle.get_nowait()
+        except queue.Empty:
+            yield None
+            return
+        try:
+            yield worker
+        finally:
+            self._idle.put(worker)
+
+
+def convert_with_calibre_pool(calibre_pool, file_path, output_file):
+    """Convert `file_path` to text in `output_file` with `ebook-convert` run in a
+    calibre worker. Return None if no worker could run it."""
+    # NOTE: ebook-convert uses the extension of its output file as the output format
+    fd, tmp_file_txt = tempfile.mkstemp(suffix='.txt')
+    os.close(fd)
+    try:
+        result = calibre_pool.run('ebook-convert', [os.fspath(file_path), tmp_file_txt])
+        if result and result.returncode == 0:
+            import shutil
+            shutil.move(tmp_file_txt, output_file)
+    finally:
+        if os.path.exists(tmp_file_txt):
+            remove_file(tmp_file_txt)
+    return result
+
+
+class MetadataFetcher:
+    """Fetch metadata from several online sources at the same time.
+
+    One `fetch-ebook-metadata` process is started per source (at most `workers`
+    at a time) as soon as the fetcher is created. :meth:`result` waits for the
+    result of a given source so that they can be presented in the configured
+    order. Each source is given `timeout` seconds and :meth:`cancel` kills the
+    processes that are still running. If a `calibre_pool` is given, a source is
+    fetched in an idle calibre worker instead of a new process (a cancelled fetch
+    kills its worker).
+    """
+    def __init__(self, sources, fetch_arg, workers=FETCH_WORKERS, timeout=FETCH_TIMEOUT,
+                 cache=None, query=None, refresh=False, calibre_pool=None):
+        self.fetch_arg = fetch_arg
+        self.timeout = timeout
+        self.cache = cache
+        self.query = query
+        self.calibre_pool = calibre_pool
+        self._cancelled = False
+        self._lock = threading.Lock()
+        self._procs = set()
+        self._workers = set()
+        self._timed_out = set()
+        from concurrent.futures import Future, ThreadPoolExecutor
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._futures = OrderedDict()
+        for source in sources:
+            metadata = None
+            if cache and not refresh:
+                metadata = cache.get_metadata(source, query)
+            if metadata is None:
+                self._futures[source] = self._pool.submit(self._fetch, source)
+            else:
+                logger.debug(f"Metadata from '{source}' found in cache")
+                metrics.count('fetch_cache_hits')
+                self._futures[source] = Future()
+                self._futures[source].set_result(metadata)
+
+    def _fetch(self, source):
+        args = shlex.split(self.fetch_arg) + [f'--allowed-plugin={source}']
+        start = time.perf_counter()
+        try:
+            result = None
+            if self.calibre_pool:
+                result = self._run_fetch_in_worker(args)
+            if result is None:
+                result = self._run_fetch(['fetch-ebook-metadata'] + args)
+        except subprocess.TimeoutExpired:
+            self._timed_out.add(source)
+            metrics.count('fetch_timeouts')
+            return ''
+        finally:
+            metrics.add('fetch', time.perf_counter() - start)
+        stdout = result.stdout
+        if self._cancelled:
+            return stdout
+        # NOTE: fetch-ebook-metadata exits with 1 when nothing is found but also when the
+        # source fails (e.g. network error), which must not be cached
+        found_nothing = result.returncode == 1 and 'No results found' in result.stderr
+        if result.returncode and not found_nothing:
+            logger.debug(f"fetch-ebook-metadata ({source}) returned {result.returncode}: {result.stderr.strip()}")
+        elif self.cache:
+            self.cache.set_metadata(source, self.query, '' if found_nothing else stdout)
+        return stdout
+
+    @staticmethod
+    def _kill(proc):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    def _run_fetch_in_worker(self, args):
+        with self.calibre_pool.worker() as worker:
+            if worker is None:
+                return None
+            with self._lock:
+                if self._cancelled:
+                    return None
+                self._workers.add(worker)
+            try:
+                return worker.run('fetch-ebook-metadata', args, self.timeout)
+            finally:
+                with self._lock:
+                    self._workers.discard(worker)
+
+    def _run_fetch(self, cmd):
+        with self._lock:
+            if self._cancelled:
+                return subprocess.CompletedProcess(cmd, 0, '', '')
+            # New session so that the whole process group can be killed
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    universal_newlines=True, start_new_session=True)
+            self._procs.add(proc)
+        try:
+            stdout, stderr = proc.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            self._kill(proc)
+            proc.communicate()
+            raise
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            procs = list(self._procs)
+            workers = list(self._workers)
+        for future in self._futures.values():
+            future.cancel()
+        for proc in procs:
+            self._kill(proc)
+        # NOTE: the fetch can't be stopped without the worker, which is started again when needed
+        for worker in workers:
+            worker.kill()
+        self._pool.shutdown(wait=False)
+
+    def result(self, source):
+        """Wait for and return the metadata fetched from `source` ('' if none)."""
+        future = self._futures[source]
+        if future.cancelled():
+            return ''
+        try:
+            metadata = future.result()
+        except OSError as e:
+            logger.error(red(f"Couldn't fetch metadata from '{source}': {e}"))
+            return ''
+        if source in self._timed_out:
+            logger.warning(yellow(f"Timeout ({self.timeout} s) when fetching metadata from '{source}'"))
+        return metadata
+
+
+class ConversionCache:
+    """Text conversions of ebooks saved in a folder and reused by the `l` option.
+
+    A conversion is identified by the file identity (device, inode, size and
+    mtime) and the conversion method, so it is still found after the file is
+    renamed or moved within the same filesystem. When the total size of the
+    conversions exceeds `max_size` bytes, the least recently used ones are removed.
+    """
+    def __init__(self, cache_dir, max_size=CONVERSION_CACHE_SIZE * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        # Updated each time the cache is evicted
+        self.total_size = 0
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, file_path, convert_method):
+        key = f'{file_identity(file_path)}:{convert_method}'
+        import hashlib
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + '.txt')
+
+    def commit(self, tmp_file_txt):
+        """Move a finished conversion (see :meth:`reserve`) to its final path and return it."""
+        key = Path(tmp_file_txt).name.split('.')[0]
+        cached_file_txt = os.path.join(self.cache_dir, f'{key}.txt')
+        os.replace(tmp_file_txt, cached_file_txt)
+        self.evict()
+        return cached_file_txt
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith('.part.txt'):
+                    if time.time() - stat.st_mtime > 24 * 3600:
+                        # Left by an interrupted conversion
+                        remove_file(entry.path)
+                elif entry.name.endswith('.txt'):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                logger.debug(f"Removing text conversion from cache: {path}")
+                remove_file(path)
+                total_size -= size
+            self.total_size = total_size
+
+    def get(self, file_path, convert_method):
+        """Return the path of the cached conversion of `file_path` or None."""
+        cached_file_txt = self._path(file_path, convert_method)
+        try:
+            # Its mtime is used for evicting the least recently used conversions
+            os.utime(cached_file_txt)
+        except OSError:
+            return None
+        return cached_file_txt
+
+    def reserve(self, file_path, convert_method):
+        """Return the temporary path where the conversion of `file_path` should be written."""
+        key = Path(self._path(file_path, convert_method)).stem
+        # NOTE: unique temporary path in case the same file is converted twice at the same time.
+        # It ends with .txt since ebook-convert uses the extension of its output file as the
+        # output format
+        fd, tmp_file_txt = tempfile.mkstemp(prefix=f'{key}.', suffix='.part.txt', dir=self.cache_dir)
+        os.close(fd)
+        return tmp_file_txt
+
+
+def _report_pid(pids):
+    # Initializer of the processes of the pools created by new_process_pool()
+    pids.put(os.getpid())
+
+
+def new_process_pool(workers):
+    """Return a `ProcessPoolExecutor` and a queue where each of its processes puts
+    its PID when it starts (see :func:`terminate_process_pool`).
+
+    NOTE: the processes are not forked from this process since its other threads
+    (e.g. scan, prefetch, transfers) might hold locks at that time, which would
+    deadlock them. They are started by a forkserver (or spawned) instead.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    if sys.version_info < (3, 7):
+        # No `mp_context` nor `initializer` before Python 3.7
+        return ProcessPoolExecutor(max_workers=workers), None
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(method)
+    pids = context.SimpleQueue()
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_report_pid,
+                               initargs=(pids,)), pids
+
+
+def terminate_process_pool(pool, pids):
+    """Shut down `pool` without waiting for its running tasks: its processes are terminated."""
+    pool.shutdown(wait=False)
+    while pids is not None and not pids.empty():
+        try:
+            os.kill(pids.get(), signal.SIGTERM)
+        except OSError:
+            # e.g. the process already exited
+            pass
+
+
+def _convert_to_txt_worker(file_path, tmp_file_txt, mime_type, convert_params):
+    # Run in a separate process by Preconverter
+    start = time.perf_counter()
+    result = convert_to_txt(file_path, tmp_file_txt, mime_type, **convert_params)
+    return result.returncode, result.stderr, time.perf_counter() - start
+
+
+class Preconverter:
+    """Convert upcoming files to text ahead of time in a pool of processes.
+
+    The conversions are saved in a :class:`ConversionCache` so that the `l`
+    option can show them without waiting. At most two conversions per worker
+    are pending at a time and none are scheduled when the cache is almost full.
+    """
+    def __init__(self, conversion_cache, workers, isbn_direct_files=ISBN_DIRECT_FILES, **convert_params):
+        self.conversion_cache = conversion_cache
+        self.workers = workers
+        self.isbn_direct_files = isbn_direct_files
+        self.convert_params = {k: v for k, v in convert_params.items() if k.endswith('_convert_method')}
+        self._futures = {}
+        self._pending_size = 0
+        self._lock = threading.Lock()
+        self._pool, self._pids = new_process_pool(workers)
+        conversion_cache.evict()
+
+    def _done(self, file_path, tmp_file_txt, file_size, done, future):
+        try:
+            returncode, stderr, seconds = future.result()
+            metrics.add('convert', seconds)
+        except BaseException as e:
+            # e.g. cancelled or the worker was terminated
+            returncode, stderr = None, str(e)
+        try:
+            if returncode == 0:
+                self.conversion_cache.commit(tmp_file_txt)
+                logger.debug(f"Converted '{file_path}' to text in the background")
+            else:
+                if returncode is None:
+                    logger.debug(f"Couldn't convert '{file_path}' to text in the background: {stderr}")
+                else:
+                    metrics.count('preconvert_errors')
+                    logger.warning(yellow(f"Couldn't convert '{file_path}' to text in the background: "
+                                          f"{stderr.strip()}"))
+                remove_file(tmp_file_txt)
+        except OSError as e:
+            logger.debug(f"Couldn't save the text conversion of '{file_path}': {e}")
+        finally:
+            with self._lock:
+                self._pending_size -= file_size
+                self._futures.pop(str(file_path), None)
+            done.set()
+
+    def schedule(self, file_path):
+        """Convert `file_path` in the background unless it is already cached."""
+        mime_type = get_mime_type(file_path)
+        if mime_type and re.match(self.isbn_direct_files, mime_type):
+            return
+        convert_method = get_convert_method(mime_type, **self.convert_params)
+        file_size = os.stat(file_path).st_size
+        with self._lock:
+            if str(file_path) in self._futures or len(self._futures) >= 2 * self.workers:
+                return
+            # NOTE: the size of the file is used as an estimate of its text conversion
+            if self.conversion_cache.total_size + self._pending_size + file_size > \
+                    0.9 * self.conversion_cache.max_size:
+                logger.debug(f"Conversion cache almost full, not converting '{file_path}' in the background")
+                return
+            if self.conversion_cache.get(file_path, convert_method):
+                return
+            tmp_file_txt = self.conversion_cache.reserve(file_path, convert_method)
+            future = self._pool.submit(_convert_to_txt_worker, os.fspath(file_path), tmp_file_txt, mime_type,
+                                       self.convert_params)
+            # Set once the conversion is saved in the cache (or failed)
+            done = threading.Event()
+            self._futures[str(file_path)] = (future, done)
+            self._pending_size += file_size
+        future.add_done_callback(lambda f: self._done(file_path, tmp_file_txt, file_size, done, f))
+
+    def shutdown(self):
+        with self._lock:
+            futures = [future for future, _ in self._futures.values()]
+        for future in futures:
+            future.cancel()
+        # NOTE: the running conversions are stopped instead of waited for
+        terminate_process_pool(self._pool, self._pids)
+
+    def wait(self, file_path):
+        """Wait for the background conversion of `file_path` if there is one."""
+        with self._lock:
+            entry = self._futures.get(str(file_path))
+        if entry:
+            logger.info('Waiting for the background conversion to text...')
+            entry[1].wait()
+
+
+def get_page_count(file_path, mime_type):
+    """Return the number of pages of a PDF or DjVu file (with `pdfinfo` or
+    `djvused`) or None if it can't be found."""
+    if mime_type == 'application/pdf':
+        cmd = ['pdfinfo', file_path]
+    elif mime_type.startswith('image/vnd.djvu'):
+        cmd = ['djvused', '-e', 'n', file_path]
+    else:
+        return None
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+    except OSError:
+        return None
+    match = re.search(r'^(?:Pages:\s*)?(\d+)\s*$', result.stdout, re.MULTILINE)
+    return int(match.group(1)) if result.returncode == 0 and match else None
+
+
+def convert_pages_to_txt(file_path, mime_type, pages=HARVEST_PAGES, isbn_direct_files=ISBN_DIRECT_FILES,
+                         pdf_convert_method=PDF_CONVERT_METHOD, djvu_convert_method=DJVU_CONVERT_METHOD,
+                         **convert_params):
+    """Return the text of the first and last `pages` pages of `file_path`.
+
+    Only PDF (with `pdftotext`) and DjVu (with `djvutxt`) files can be partially
+    converted, the other files are converted entirely with `convert_to_txt`. For
+    the text files, their start and end are read directly.
+    """
+    mime_type = mime_type or ''
+    if re.match(isbn_direct_files, mime_type):
+        # NOTE: about 4 KiB of text per page
+        with open(file_path, 'rb') as f:
+            head = f.read(pages * 4096)
+            f.seek(max(f.tell(), os.fstat(f.fileno()).st_size - pages * 4096))
+            return (head + f.read()).decode(errors='replace')
+    if mime_type == 'application/pdf' and pdf_convert_method == 'pdftotext':
+        def cmd(first, last):
+            return ['pdftotext', '-f', str(first), '-l', str(last), file_path, '-']
+    elif mime_type.startswith('image/vnd.djvu') and djvu_convert_method == 'djvutxt':
+        def cmd(first, last):
+            return ['djvutxt', f'--page={first}-{last}', file_path]
+    else:
+        with tempfile.NamedTemporaryFile(suffix='.txt') as f:
+            result = convert_to_txt(file_path, f.name, mime_type, pdf_convert_method=pdf_convert_method,
+                                    djvu_convert_method=djvu_convert_method, **convert_params)
+            return f.read().decode(errors='replace') if result.returncode == 0 else ''
+    ranges = [(1, pages)]
+    # NOTE: if the number of pages is unknown, only the first pages are converted
+    page_count = get_page_count(file_path, mime_type)
+    if page_count and page_count > pages:
+        ranges.append((max(pages + 1, page_count - pages + 1), page_count))
+    texts = []
+    for first, last in ranges:
+        result = subprocess.run(cmd(first, last), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        texts.append(result.stdout.decode(errors='replace'))
+    return '\n'.join(texts)
+
+
+def _harvest_isbns_worker(file_path, pages, isbn_direct_files, convert_params):
+    # Run in a separate process by IsbnHarvester
+    start = time.perf_counter()
+    text = convert_pages_to_txt(file_path, get_mime_type(file_path), pages, isbn_direct_files, **convert_params)
+    # NOTE: the same ISBN is often found on several pages
+    isbns = dict.fromkeys(find_isbns(text, isbn_ret_separator='\n').split())
+    return '\n'.join(isbns), time.perf_counter() - start
+
+
+class IsbnCache(SqliteCache):
+    """Cache of the ISBNs found in the content of the files (see :class:`IsbnHarvester`).
+
+    A file is identified by :func:`file_identity` and the number of pages
+    converted. An empty value means that no ISBN was found.
+    """
+    table = 'isbns'
+
+    def __init__(self, db_path, max_entries=ISBN_CACHE_SIZE):
+        super().__init__(db_path, max_entries=max_entries)
+
+    @staticmethod
+    def file_key(file_path, pages):
+        return f'{file_identity(file_path)}:{pages}'
+
+
+class EbookMetaCache(SqliteCache):
+    """Cache of the output of `ebook-meta` (the `?` option), keyed by :func:`file_identity`.
+
+    The failed runs are not cached.
+    """
+    table = 'ebook_meta'
+
+    def __init__(self, db_path, max_entries=EBOOK_META_CACHE_SIZE):
+        super().__init__(db_path, max_entries=max_entries)
+
+
+def get_cached_ebook_metadata(file_path, ebook_meta_cache=None, calibre_pool=None):
+    """Return the output of `ebook-meta` for `file_path`, from `ebook_meta_cache` if
+    it is there. Otherwise, `ebook-meta` is run in an idle worker of `calibre_pool`
+    (if any) or in a new process."""
+    key = None
+    if ebook_meta_cache:
+        try:
+            key = file_identity(file_path)
+        except OSError as e:
+            logger.debug(f"Couldn't stat '{file_path}': {e}")
+        ebook_meta = ebook_meta_cache.get(key) if key else None
+        if ebook_meta is not None:
+            logger.debug(f"Output of ebook-meta found in cache for '{file_path}'")
+            metrics.count('ebook_meta_cache_hits')
+            return ebook_meta
+    with metrics.timer('ebook_meta'):
+        result = calibre_pool.run('ebook-meta', [os.fspath(file_path)]) if calibre_pool else None
+        if result is None:
+            result = get_ebook_metadata(file_path)
+    # TODO: result.stderr? if returncode!=0?
+    logger.debug(f'returncode: {result.returncode}')
+    if result.returncode == 0 and key:
+        ebook_meta_cache.set(key, result.stdout)
+    return result.stdout
+
+
+class EbookMetaPreloader:
+    """Run `ebook-meta` on the upcoming files in a pool of threads so that its
+    output is already in the :class:`EbookMetaCache` when the `?` option is used."""
+    def __init__(self, ebook_meta_cache, workers, calibre_pool=None):
+        self.ebook_meta_cache = ebook_meta_cache
+        self.calibre_pool = calibre_pool
+        self._futures = {}
+        self._lock = threading.Lock()
+        from concurrent.futures import ThreadPoolExecutor
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+
+    def _run(self, file_path):
+        try:
+            get_cached_ebook_metadata(file_path, self.ebook_meta_cache, self.calibre_pool)
+        except OSError as e:
+            logger.debug(f"Couldn't run ebook-meta on '{file_path}' in the background: {e}")
+        finally:
+            with self._lock:
+                self._futures.pop(str(file_path), None)
+
+    def schedule(self, file_path):
+        """Run `ebook-meta` on `file_path` in the background unless its output is already cached."""
+        key = file_identity(file_path)
+        with self._lock:
+            if str(file_path) in self._futures or self.ebook_meta_cache.get(key) is not None:
+                return
+            self._futures[str(file_path)] = self._pool.submit(self._run, file_path)
+
+    def shutdown(self):
+        with self._lock:
+            futures = list(self._futures.values())
+        for future in futures:
+            future.cancel()
+        self._pool.shutdown(wait=False)
+
+    def wait(self, file_path):
+        """Wait for the background run of `ebook-meta` on `file_path` if there is one."""
+        with self._lock:
+            future = self._futures.get(str(file_path))
+        if future:
+            logger.info('Waiting for ebook-meta running in the background...')
+            future.exception()
+
+
+class IsbnHarvester:
+    """Search for ISBNs in the content of files in a pool of processes.
+
+    Only the first and last `pages` pages of a file are converted to text (see
+    :func:`convert_pages_to_txt`) since this is where the ISBNs of an ebook
+    usually are. The ISBNs found (or not) are saved in an :class:`IsbnCache`.
+    """
+    def __init__(self, isbn_cache, workers, pages=HARVEST_PAGES, isbn_direct_files=ISBN_DIRECT_FILES,
+                 **convert_params):
+        self.isbn_cache = isbn_cache
+        self.pages = pages
+        self.isbn_direct_files = isbn_direct_files
+        self.convert_params = {k: v for k, v in convert_params.items() if k.endswith('_convert_method')}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._pool, self._pids = new_process_pool(workers)
+
+    def _done(self, file_path, key, done, future):
+        try:
+            isbns, seconds = future.result()
+            metrics.add('harvest', seconds)
+            self.isbn_cache.set(key, isbns)
+            logger.debug(f"ISBNs found in '{file_path}': {isbns.split() or 'none'}")
+        except BaseException as e:
+            # e.g. cancelled or the worker was terminated
+            logger.debug(f"Couldn't search for ISBNs in '{file_path}': {e}")
+        finally:
+            with self._lock:
+                self._futures.pop(str(file_path), None)
+            done.set()
+
+    def get(self, file_path, wait=False):
+        """Return the ISBNs found in `file_path` or None if it wasn't searched (yet).
+
+        If `wait`, the search of `file_path` is waited for if it is running.
+        """
+        with self._lock:
+            entry = self._futures.get(str(file_path))
+        if entry:
+            if not wait:
+                return None
+            logger.info('Waiting for the search of ISBNs in the content...')
+            entry[1].wait()
+        isbns = self.isbn_cache.get(IsbnCache.file_key(file_path, self.pages))
+        return None if isbns is None else isbns.split()
+
+    def schedule(self, file_path):
+        """Search for ISBNs in `file_path` in the background unless it is already cached."""
+        key = IsbnCache.file_key(file_path, self.pages)
+        with self._lock:
+            if str(file_path) in self._futures:
+                return
+            if self.isbn_cache.get(key) is not None:
+                metrics.count('isbn_cache_hits')
+                return
+            future = self._pool.submit(_harvest_isbns_worker, os.fspath(file_path), self.pages,
+                                       self.isbn_direct_files, self.convert_params)
+            # Set once the ISBNs are saved in the cache (or the search failed)
+            done = threading.Event()
+            self._futures[str(file_path)] = (future, done)
+        future.add_done_callback(lambda f: self._done(file_path, key, done, f))
+
+    def shutdown(self):
+        with self._lock:
+            futures = [future for future, _ in self._futures.values()]
+        for future in futures:
+            future.cancel()
+        terminate_process_pool(self._pool, self._pids)
+
+
+def batch_check_file(file_path, metadata_extension=OUTPUT_METADATA_EXTENSION,
+                     tokens_to_ignore=TOKENS_TO_IGNORE, token_min_length=TOKEN_MIN_LENGTH):
+    """Check `file_path` like the quick mode does, for the batch mode.
+
+    Return `file_path`, the code of the check (see :data:`CheckResult`) and the
+    sorted missing words. It is run in a separate process.
+    """
+    metadata_path = f'{file_path}.{metadata_extension}'
+    try:
+        with open(metadata_path, 'r') as f:
+            fields = MetadataCache.parse(f.read())
+    except FileNotFoundError:
+        return file_path, 1, []
+    old_name = normalize("NFKC", Path(fields.get('Old file path', '')).name)
+    filename = normalize("NFKC", Path(file_path).name)
+    _, missing_tokens = get_token_matcher(tokens_to_ignore, token_min_length).compare(old_name, filename)
+    return file_path, 2 if missing_tokens else 3, sorted(missing_tokens)
+
+
+class ScanIndex:
+    """Persistent index of the checks done on the files of an input folder.
+
+    For each file (relative path), it saves its size and mtime, the mtime of its
+    metadata file and the result of the check (see :data:`CHECK_STATUSES`), so
+    that only the files that changed since the last scan are checked again. A
+    result is also recomputed if the settings used for the check changed.
+    """
+    def __init__(self, db_path, base_dir, settings, metadata_extension=OUTPUT_METADATA_EXTENSION):
+        self.base_dir = base_dir
+        self.settings = json.dumps(settings)
+        self.metadata_extension = metadata_extension
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        import sqlite3
+        self._conn = sqlite3.connect(db_path)
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS files (relpath TEXT PRIMARY KEY, size INTEGER, '
+                               'mtime_ns INTEGER, meta_mtime_ns INTEGER, settings TEXT, code INTEGER, '
+                               'missing TEXT)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS files_code ON files (code)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)')
+        self._pending = 0
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+    @property
+    def last_scan(self):
+        row = self._conn.execute("SELECT value FROM info WHERE key = 'last_scan'").fetchone()
+        return float(row[0]) if row else None
+
+    def lookup(self, relpath, stamp):
+        """Return the saved `(code, missing tokens)` of `relpath` if it didn't change."""
+        row = self._conn.execute('SELECT size, mtime_ns, meta_mtime_ns, settings, code, missing FROM files '
+                                 'WHERE relpath = ?', (relpath,)).fetchone()
+        if row is None or tuple(row[:3]) != stamp or row[3] != self.settings:
+            return None
+        return row[4], json.loads(row[5])
+
+    def prune(self, relpaths):
+        """Remove the files that are not in `relpaths` (i.e. not found by a full scan)."""
+        indexed = {row[0] for row in self._conn.execute('SELECT relpath FROM files')}
+        self._conn.executemany('DELETE FROM files WHERE relpath = ?', ((r,) for r in indexed - set(relpaths)))
+        self._conn.execute("INSERT OR REPLACE INTO info VALUES ('last_scan', ?)", (str(time.time()),))
+        self._conn.commit()
+
+    def query(self, code):
+        """Return the relative paths of the files whose check returned `code` (without accessing them)."""
+        return [row[0] for row in self._conn.execute('SELECT relpath FROM files WHERE code = ? '
+                                                     'ORDER BY relpath', (code,))]
+
+    def remove(self, relpath):
+        self._conn.execute('DELETE FROM files WHERE relpath = ?', (relpath,))
+
+    def stamp(self, file_path):
+        if isinstance(file_path, FileRecord):
+            # Found by the scan, no need to stat the file again (nor its missing metadata file)
+            size, mtime_ns = file_path.size, file_path.mtime_ns
+            if not file_path.has_metadata:
+                return size, mtime_ns, -1
+        else:
+            stat = os.stat(file_path)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        try:
+            meta_mtime_ns = os.stat(f'{file_path}.{self.metadata_extension}').st_mtime_ns
+        except FileNotFoundError:
+            meta_mtime_ns = -1
+        return size, mtime_ns, meta_mtime_ns
+
+    def store(self, relpath, stamp, code, missing_tokens):
+        self._conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)',
+                           (relpath,) + tuple(stamp) + (self.settings, code, json.dumps(missing_tokens)))
+        self._pending += 1
+        if self._pending >= 500:
+            self._conn.commit()
+            self._pending = 0
+
+
+class TransferQueue:
+    """Move the files to their destination in background threads so that the
+    next file can be reviewed right away (e.g. when the output folder is on
+    another filesystem and the files have to be copied).
+
+    A job moves a file and then its metadata file, so they are always moved
+    together. The failed jobs are kept in `failed` as (description, error).
+    """
+    def __init__(self, workers=TRANSFER_WORKERS):
+        from concurrent.futures import ThreadPoolExecutor
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='transfer')
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.failed = []
+        self._reported = 0
+
+    def _done(self, description, future):
+        error = future.exception()
+        with self._lock:
+            self.pending -= 1
+            if error:
+                self.failed.append((description, error))
+
+    def new_failures(self):
+        """Return the failed jobs that were not returned yet."""
+        with self._lock:
+            failures = self.failed[self._reported:]
+            self._reported = len(self.failed)
+        return failures
+
+    def shutdown(self):
+        """Wait for the pending jobs to finish."""
+        if self.pending:
+            logger.info(blue(f'Waiting for {self.pending} pending transfers to finish...'))
+        self._pool.shutdown(wait=True)
+
+    def status(self):
+        """Return the status line of the transfers or '' if there is nothing to report."""
+        with self._lock:
+            pending, failed = self.pending, len(self.failed)
+        if not pending and not failed:
+            return ''
+        status = f'Transfers: {pending} pending'
+        if failed:
+            status += ', ' + red(f'{failed} failed')
+        return status
+
+    def submit(self, description, func, *args):
+        with self._lock:
+            self.pending += 1
+        future = self._pool.submit(func, *args)
+        future.add_done_callback(partial(self._done, description))
+
+
+class DuplicateFinder:
+    """Find the files with the same content in some folders, in a background thread.
+
+    The files are first grouped by size: only the files with the same size as
+    another one are read. For these, a blake2 hash of a sample (the first and
+    last `sample_size` bytes) is computed and only the files with the same
+    sample are completely hashed (with mmap) to confirm that they are
+    duplicates. The hashes are computed in a pool of `workers` threads.
+
+    :meth:`get` returns the twin found for a file, if any, without waiting for
+    the search to end. The folders are searched in order, thus with the output
+    folders first, the twin of a file is preferably one already organized.
+    """
+    def __init__(self, folders, ignored_extension=OUTPUT_METADATA_EXTENSION, workers=HASH_WORKERS,
+                 sample_size=HASH_SAMPLE_SIZE):
+        self.folders = folders
+        self.ignored_extension = ignored_extension
+        self.workers = workers
+        self.sample_size = sample_size
+        # file path -> paths of the files with the same content (including itself)
+        self._groups = {}
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _full_digest(file_path, chunk_size=1024 ** 2):
+        import hashlib
+        import mmap
+
+        digest = hashlib.blake2b()
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            view = memoryview(m)
+            try:
+                for offset in range(0, len(m), chunk_size):
+                    digest.update(view[offset:offset + chunk_size])
+            finally:
+                view.release()
+        return digest.digest()
+
+    def _group_by(self, digest_func, paths, pool):
+        groups = {}
+        for file_path, digest in zip(paths, pool.map(self._safe(digest_func), paths)):
+            if digest is not None:
+                groups.setdefault(digest, []).append(file_path)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def _run(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        buckets = {}
+        seen = set()
+        for folder in self.folders:
+            for record in scan_folder(folder, self.ignored_extension, self.workers):
+                if self._stopped:
+                    return
+                file_path = os.fspath(record)
+                # NOTE: empty files are not reported and a file is only counted once
+                # (e.g. an output folder inside the input folder)
+                if record.size > 0 and file_path not in seen:
+                    seen.add(file_path)
+                    buckets.setdefault(record.size, []).append(file_path)
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            for size, paths in buckets.items():
+                if len(paths) < 2:
+                    continue
+                for group in self._group_by(self._sample_digest, paths, pool):
+                    if self._stopped:
+                        return
+                    # The sample is the whole file for small files
+                    if size > 2 * self.sample_size:
+                        with metrics.timer('hash'):
+                            confirmed = self._group_by(self._full_digest, group, pool)
+                    else:
+                        confirmed = [group]
+                    with self._lock:
+                        for twins in confirmed:
+                            metrics.count('duplicates', len(twins) - 1)
+                            for file_path in twins:
+                                self._groups[file_path] = twins
+
+    def _safe(self, digest_func):
+        def digest(file_path):
+            try:
+                return digest_func(file_path)
+            except (OSError, ValueError) as e:
+                # e.g. the file was moved in the meantime
+                logger.debug(f"Couldn't hash '{file_path}': {e}")
+                return None
+        return digest
+
+    def _sample_digest(self, file_path):
+        import hashlib
+
+        with open(file_path, 'rb') as f:
+            sample = f.read(self.sample_size)
+            size = os.fstat(f.fileno()).st_size
+            if size > 2 * self.sample_size:
+                f.seek(-self.sample_size, os.SEEK_END)
+            sample += f.read(self.sample_size)
+        return hashlib.blake2b(sample, digest_size=16).digest()
+
+    def get(self, file_path):
+        """Return the path of a file with the same content as `file_path` (or None
+        if none was found yet)."""
+        file_path = os.fspath(file_path)
+        with self._lock:
+            twins = self._groups.get(file_path, [])
+            for twin in twins:
+                if twin != file_path and os.path.exists(twin):
+                    return twin
+        return None
+
+    def rename(self, old_path, new_path):
+        """Update the groups after `old_path` was moved to `new_path`."""
+        old_path, new_path = os.fspath(old_path), os.fspath(new_path)
+        with self._lock:
+            twins = self._groups.pop(old_path, None)
+            if twins:
+                twins[twins.index(old_path)] = new_path
+                self._groups[new_path] = twins
+
+    def stop(self):
+        self._stopped = True
+
+
+class Inotify:
+    """Minimal ctypes wrapper around Linux's inotify for watching folders.
+
+    Raise OSError if inotify is not available (e.g. on macOS).
+    """
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        libc_name = ctypes.util.find_library('c')
+        if not sys.platform.startswith('linux') or not libc_name:
+            raise OSError('inotify is not available on this platform')
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._get_errno = ctypes.get_errno
+        self._wds = {}
+
+    def add_watch(self, dir_path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dir_path), self.MASK)
+        if wd < 0:
+            raise OSError(self._get_errno(), f"inotify_add_watch failed for '{dir_path}'")
+        self._wds[wd] = dir_path
+
+    def close(self):
+        os.close(self.fd)
+
+    def read(self, timeout):
+        """Wait up to `timeout` seconds for events and return the set of folders
+        where they happened and the set of new sub-folders."""
+        import select
+        import struct
+
+        changed_dirs = set()
+        new_dirs = set()
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed_dirs, new_dirs
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed_dirs, new_dirs
+        offset = 0
+        while offset < len(buf):
+            wd, mask, _, length = struct.unpack_from('iIII', buf, offset)
+            name = buf[offset + 16:offset + 16 + length].rstrip(b'\0')
+            offset += 16 + length
+            dir_path = self._wds.get(wd)
+            if dir_path is None:
+                continue
+            changed_dirs.add(dir_path)
+            if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                new_dirs.add(os.path.join(dir_path, os.fsdecode(name)))
+        return changed_dirs, new_dirs
+
+
+class FolderWatcher:
+    """Find the files that are added to (or changed in) a folder and its sub-folders.
+
+    inotify is used where available to know which folders changed, otherwise
+    the mtimes of the folders are polled every `poll_interval` seconds (NOTE: in
+    that case, files modified in place are only found if their metadata file
+    is created or renamed). A file is only returned once it and its metadata
+    file didn't change for `settle` seconds.
+    """
+    def __init__(self, folder_path, metadata_extension=OUTPUT_METADATA_EXTENSION,
+                 settle=WATCH_SETTLE, poll_interval=WATCH_POLL_INTERVAL):
+        self.folder_path = folder_path
+        self.metadata_extension = metadata_extension
+        self.settle = settle
+        self.poll_interval = poll_interval
+        # file path -> stamp of the files already known (present at the start or returned)
+        self._known = {}
+        # file path -> (stamp, time since when it is unchanged)
+        self._pending = {}
+        # folder -> mtime (for polling)
+        self._dirs = {}
+        self._lock = threading.Lock()
+        try:
+            self._inotify = Inotify()
+        except OSError as e:
+            logger.debug(f'Watching the input folder by polling ({e})')
+            self._inotify = None
+        self._baseline = threading.Thread(target=self._add_dir, args=(folder_path, True), daemon=True)
+        self._baseline.start()
+
+    def _add_dir(self, dir_path, baseline=False):
+        # Watch `dir_path` and its sub-folders and scan their files
+        for root, dirs, _ in os.walk(dir_path):
+            if self._inotify:
+                try:
+                    self._inotify.add_watch(root)
+                except OSError as e:
+                    logger.debug(e)
+            self._scan(root, baseline)
+
+    def _scan(self, dir_path, baseline=False):
+        try:
+            with os.scandir(dir_path) as it:
+                entries = {entry.name: entry for entry in it}
+            dir_mtime = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            with self._lock:
+                self._dirs.pop(dir_path, None)
+            return
+        now = time.time()
+        with self._lock:
+            self._dirs[dir_path] = dir_mtime
+            for name, entry in entries.items():
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.path not in self._dirs and not baseline:
+                            self._dirs[entry.path] = None
+                        continue
+                    if name.startswith('.') or name.endswith(self.metadata_extension) or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    meta_entry = entries.get(f'{name}.{self.metadata_extension}')
+                    meta_stat = meta_entry.stat() if meta_entry else None
+                except OSError:
+                    continue
+                stamp = (stat.st_size, stat.st_mtime_ns,
+                         (meta_stat.st_size, meta_stat.st_mtime_ns) if meta_stat else None)
+                if baseline:
+                    self._known.setdefault(entry.path, stamp)
+                elif self._known.get(entry.path) != stamp:
+                    pending = self._pending.get(entry.path)
+                    if pending is None or pending[0] != stamp:
+                        self._pending[entry.path] = (stamp, now)
+
+    def close(self):
+        if self._inotify:
+            self._inotify.close()
+
+    def mark(self, file_path):
+        """Don't return `file_path` unless it changes (e.g. it is being reviewed)."""
+        file_path = os.fspath(file_path)
+        folder, name = os.path.split(file_path)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return
+        try:
+            meta_stat = os.stat(os.path.join(folder, f'{name}.{self.metadata_extension}'))
+            meta_stamp = (meta_stat.st_size, meta_stat.st_mtime_ns)
+        except OSError:
+            meta_stamp = None
+        with self._lock:
+            self._known[file_path] = (stat.st_size, stat.st_mtime_ns, meta_stamp)
+            self._pending.pop(file_path, None)
+
+    def wait_for_files(self):
+        """Block until new or changed files are settled and return them sorted."""
+        self._baseline.join()
+        while True:
+            timeout = min(self.poll_interval, self.settle) if self._pending else self.poll_interval
+            if self._inotify:
+                changed_dirs, new_dirs = self._inotify.read(timeout)
+            else:
+                time.sleep(timeout)
+                changed_dirs, new_dirs = set(), set()
+                with self._lock:
+                    dirs = list(self._dirs.items())
+                for dir_path, mtime in dirs:
+                    try:
+                        if os.stat(dir_path).st_mtime_ns != mtime:
+                            changed_dirs.add(dir_path)
+                    except OSError:
+                        with self._lock:
+                            self._dirs.pop(dir_path, None)
+                new_dirs = {dir_path for dir_path, mtime in dirs if mtime is None}
+            for dir_path in new_dirs:
+                self._add_dir(dir_path)
+            with self._lock:
+                # The folders of the pending files are scanned until these files are settled
+                changed_dirs.update(os.path.dirname(file_path) for file_path in self._pending)
+            for dir_path in changed_dirs - new_dirs:
+                self._scan(dir_path)
+            now = time.time()
+            with self._lock:
+                ready = [file_path for file_path, (_, since) in self._pending.items()
+                         if now - since >= self.settle]
+                for file_path in ready:
+                    self._known[file_path] = self._pending.pop(file_path)[0]
+            ready = [file_path for file_path in ready if os.path.exists(file_path)]
+            if ready:
+                return [Path(file_path) for file_path in sorted(ready)]
+
+
+class SessionJournal:
+    """Append-only journal of the decisions (moved, renamed, skipped) made on files.
+
+    One JSON object is written per line with the path of the file relative to
+    `base_dir`. Each line is flushed right away but, for speed, `os.fsync` is
+    only called every `sync_every` records or `sync_interval` seconds (and when
+    the journal is closed).
+    """
+    def __init__(self, path, base_dir, sync_every=32, sync_interval=5):
+        self.path = path
+        self.base_dir = base_dir
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._file = open(path, 'a', encoding='utf-8')
+        self._unsynced = 0
+        self._last_sync = time.time()
+        # NOTE: moves are recorded from the transfer threads
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load(path):
+        """Return the set of relative paths that have a decision in the journal at `path`."""
+        decided = set()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        decided.add(json.loads(line)['path'])
+                    except (ValueError, KeyError):
+                        # e.g. last line not completely written
+                        continue
+        except FileNotFoundError:
+            pass
+        return decided
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._file.close()
+
+    def record(self, action, file_path, new_path=''):
+        entry = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'action': action,
+                 'path': self.relpath(file_path)}
+        if new_path:
+            entry['new_path'] = os.fspath(new_path)
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every or time.time() - self._last_sync >= self.sync_interval:
+                self._sync()
+
+    def relpath(self, file_path):
+        return os.path.relpath(file_path, self.base_dir)
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        if self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+        self._last_sync = time.time()
+
+
+class DestinationIndex:
+    """Names of the entries in the output folders, used to find non-colliding
+    filenames without probing the folders on disk for each move.
+
+    The names of a folder are listed once, the first time a file is moved
+    there, and then kept up to date with the moves done by the organizer.
+    Since other programs can also write in these folders, the chosen name is
+    still checked on disk before it is returned.
+    """
+    def __init__(self):
+        # folder -> set of names
+        self._names = {}
+        self._lock = threading.Lock()
+
+    def _get_names(self, folder_path):
+        names = self._names.get(folder_path)
+        if names is None:
+            try:
+                with os.scandir(folder_path) as it:
+                    names = {entry.name for entry in it}
+            except FileNotFoundError:
+                names = set()
+            self._names[folder_path] = names
+        return names
+
+    def clear(self):
+        with self._lock:
+            self._names.clear()
+
+    def add(self, file_path):
+        """Record `file_path` (e.g. a metadata file moved along with its ebook)."""
+        folder_path, name = os.path.split(os.path.abspath(file_path))
+        with self._lock:
+            names = self._names.get(folder_path)
+            if names is not None:
+                names.add(name)
+
+    def discard(self, file_path):
+        """Forget the name of `file_path` (e.g. it was moved out of its folder)."""
+        folder_path, name = os.path.split(os.path.abspath(file_path))
+        with self._lock:
+            names = self._names.get(folder_path)
+            if names is not None:
+                names.discard(name)
+
+    def unique_filename(self, folder_path, basename):
+        """Return a path in `folder_path` for `basename` that doesn't collide with
+        an existing entry, the same way as :func:`unique_filename` does, i.e.
+        `stem N.ext` with the smallest counter N available.
+
+        The returned name is reserved in the index (not on disk) so that it isn't
+        returned again, e.g. for another file moved there before this one.
+        """
+        folder_path = os.path.abspath(folder_path)
+        stem, ext = os.path.splitext(basename)
+        with self._lock:
+            names = self._get_names(folder_path)
+            name = basename
+            counter = 0
+            while True:
+                if name not in names:
+                    new_path = os.path.join(folder_path, name)
+                    # The name is now taken either by us or by another program
+                    names.add(name)
+                    if not os.path.lexists(new_path):
+                        return new_path
+                    logger.debug(f"File '{name}' was created in '{folder_path}' by another program")
+                counter += 1
+                logger.debug(f"File '{name}' already exists in destination '{folder_path}', "
+                             f"trying with counter {counter}!")
+                name = f'{stem} {counter}{ext}'
+
+
+# Parsed metadata file: its whole text and a dict of its fields (e.g. 'Old file path')
+Metadata = namedtuple('Metadata', ['text', 'fields'])
+
+
+class MetadataCache:
+    """LRU cache of the parsed metadata files (e.g. `.meta`), keyed by path.
+
+    An entry is only served if the metadata file still has the same mtime and
+    size as when it was read, so a single `stat` is done instead of reading the
+    whole file each time its fields are needed.
+    """
+    def __init__(self, maxsize=METADATA_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse(text):
+        fields = {}
+        for line in text.splitlines():
+            match = re.match(r'^(\S[^:]*?)\s*:\s?(.*)$', line)
+            if match:
+                # Only the first value of a field is kept
+                fields.setdefault(match.group(1), match.group(2))
+        return fields
+
+    def get(self, metadata_path):
+        """Return the :data:`Metadata` of `metadata_path` or None if it doesn't exist."""
+        key = os.fspath(metadata_path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            self.invalidate(key)
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                metrics.count('metadata_cache_hits')
+                return entry[1]
+        with metrics.timer('sidecar'):
+            with open(key, 'r') as f:
+                text = f.read()
+            metadata = Metadata(text, self.parse(text))
+        with self._lock:
+            self._entries[key] = (stamp, metadata)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return metadata
+
+    def invalidate(self, metadata_path):
+        with self._lock:
+            self._entries.pop(os.fspath(metadata_path), None)
+
+
 # Ref.:
 def rlinput(prompt, prefill=''):
+    import readline
     readline.set_completer_delims('\t')
     readline.parse_and_bind("tab: complete")
     readline.set_completer(path_completer)
@@ -182,10 +2262,41 @@ class InteractiveOrganizer:
         # Interactive options
         # ===================
         self.quick_mode = QUICK_MODE
+        self.batch_mode = BATCH_MODE
+        self.batch_report = BATCH_REPORT
+        self.batch_workers = BATCH_WORKERS
+        self.prefetch = PREFETCH
+        self.journal = JOURNAL
+        self.resume = RESUME
+        self.only = ONLY
+        self.refresh_index = REFRESH_INDEX
+        self.order = ORDER
+        self.watch = WATCH
+        self.stats = STATS
+        self.duplicates = DUPLICATES
+        self.hash_workers = HASH_WORKERS
+        self.profile = PROFILE
+        self.watch_settle = WATCH_SETTLE
+        self.watch_poll_interval = WATCH_POLL_INTERVAL
+        self.preconvert = PRECONVERT
+        self.transfer_workers = TRANSFER_WORKERS
         self.token_min_length = TOKEN_MIN_LENGTH
         self.tokens_to_ignore = TOKENS_TO_IGNORE
         self.isbn_metadata_fetch_order = ISBN_METADATA_FETCH_ORDER
         self.organize_without_isbn_sources = ORGANIZE_WITHOUT_ISBN_SOURCES
+        self.fetch_workers = FETCH_WORKERS
+        self.fetch_timeout = FETCH_TIMEOUT
+        self.calibre_workers = CALIBRE_WORKERS
+        self.calibre_worker_cmd = CALIBRE_WORKER_CMD
+        self.no_fetch_cache = NO_FETCH_CACHE
+        self.refresh_fetch_cache = REFRESH_FETCH_CACHE
+        self.fetch_cache_ttl = FETCH_CACHE_TTL
+        self.fetch_cache_size = FETCH_CACHE_SIZE
+        self.conversion_cache_size = CONVERSION_CACHE_SIZE
+        self.harvest_isbns = HARVEST_ISBNS
+        self.harvest_pages = HARVEST_PAGES
+        self.ebook_meta_cache_size = EBOOK_META_CACHE_SIZE
+        self.preload_ebook_meta = PRELOAD_EBOOK_META
         # self.diacritic_difference_maskings = DIACRITIC_DIFFERENCE_MASKINGS
         # self.match_partial_words = MATCH_PARTIAL_WORDS
         # ====================
@@ -197,30 +2308,35 @@ class InteractiveOrganizer:
         self.restore_original_base_dir = RESTORE_ORIGINAL_BASE_DIR
         self.output_metadata_extension = OUTPUT_METADATA_EXTENSION
         self.output_filename_template = OUTPUT_FILENAME_TEMPLATE
+        self.scan_workers = SCAN_WORKERS
+        self.cache_dir = CACHE_DIR
+        self._prefetcher = None
+        self._token_matcher = None
+        self._metadata_cache = MetadataCache()
+        self._destination_index = DestinationIndex()
+        self._fetch_cache = None
+        self._conversion_cache = None
+        self._preconverter = None
+        self._isbn_harvester = None
+        self._isbn_cache = None
+        self._ebook_meta_cache = None
+        self._ebook_meta_preloader = None
+        self._calibre_pool = None
+        self._journal = None
+        self._scan_index = None
+        self._watcher = None
+        self._transfer_queue = None
+        self._duplicate_finder = None
 
     @staticmethod
     def _color_tokens_in_string(s, tokens, color='red'):
-        def color_sub(sub):
-            if color == 'red':
-                return f'REDCODE{sub}NCCODE'
-            elif color == 'green':
-                return f'GREENCODE{sub}NCCODE'
-            elif color == 'blue':
-                return f'BLUECODE({sub}NCCODE'
-            else:
-                return f'YELLOWCODE{sub}NCCODE'
-        for token in tokens:
-            # NOTE: doesn't work, e.g. for (1st) Oxford (2nd) -> red(Ox)green(for)d [we want Oxford all red]
-            # s = s.replace(token, color_token())
-            s = re.sub(r"([\W\d_]*)({})([\W\d_]+)".format(token),  r'\1' + color_sub(r'\2') + r'\3', s, 0, re.MULTILINE)
-        return s
+        # NOTE: tokens are matched as whole words, e.g. for (1st) Oxford (2nd) -> Oxford not colored
+        return highlight_tokens(s, dict.fromkeys(tokens, COLORS[color.upper()]))
 
-    @staticmethod
-    def _get_old_path(file_path, metadata_path):
-        if Path(metadata_path).exists():
-            with open(metadata_path, 'r') as f:
-                metadata = f.read()
-            return search_meta_val(metadata, 'Old file path')
+    def _get_old_path(self, file_path, metadata_path):
+        metadata = self._metadata_cache.get(metadata_path)
+        if metadata:
+            return metadata.fields.get('Old file path', '')
         else:
             logger.debug('No metadata found!')
             return file_path
@@ -273,65 +2389,280 @@ class InteractiveOrganizer:
             raise SystemExit(blue('Quitting!'))
         return choice
 
+    def _batch_organize(self):
+        """Move all the files that pass the quick mode check to the default output
+        folder, without any interaction, and write a report of the skipped files."""
+        if not self.output_folders:
+            logger.error(red('The batch mode requires an output folder (`-o` option)!'))
+            return 1
+        files = list(metrics.timed_iter('scan', scan_folder(
+            self.folder_to_organize, self.output_metadata_extension, self.scan_workers)))
+        logger.info(f'Checking {len(files)} files with {self.batch_workers} processes...')
+        moved = 0
+        skipped = []
+        pool, pids = new_process_pool(max(1, self.batch_workers))
+        try:
+            # NOTE: only the files that changed since the last scan are checked again
+            for file_path, code, missing_tokens in self._indexed_checks(files, pool, full_scan=True):
+                if code == 1:
+                    skipped.append(('no metadata', file_path))
+                elif code == 2:
+                    skipped.append((f"missing words: {', '.join(missing_tokens)}", file_path))
+                else:
+                    try:
+                        self._move_or_link_file_and_maybe_meta(self.output_folders[0], file_path,
+                                                               f'{file_path}.{self.output_metadata_extension}')
+                        moved += 1
+                    except OSError as e:
+                        skipped.append((f'error: {e}', file_path))
+        except BaseException:
+            # e.g. Ctrl+C: the running checks are stopped instead of waited for
+            terminate_process_pool(pool, pids)
+            raise
+        pool.shutdown()
+        logger.info(blue(f'{moved} files moved to {self.output_folders[0]}, {len(skipped)} files skipped'))
+        if self.batch_report:
+            with open(self.batch_report, 'w') as f:
+                f.write(f"Batch quick mode report ({time.strftime('%Y-%m-%d %H:%M:%S')})\n")
+                f.write(f'Input folder: {self.folder_to_organize}\n')
+                f.write(f'Output folder: {self.output_folders[0]}\n')
+                f.write(f'Moved: {moved}\n')
+                f.write(f'Skipped: {len(skipped)}\n\n')
+                for reason, file_path in skipped:
+                    f.write(f'[{reason}] {file_path}\n')
+            logger.info(f"Report of the skipped files written to '{self.batch_report}'")
+        return 0
+
+    def _folder_id(self):
+        # Identifies the input folder in the cache folder
+        import hashlib
+        return hashlib.sha1(os.path.abspath(self.folder_to_organize).encode()).hexdigest()
+
+    def _get_scan_index(self):
+        if self._scan_index is None:
+            self._scan_index = ScanIndex(os.path.join(self.cache_dir, 'index', f'{self._folder_id()}.sqlite'),
+                                         self.folder_to_organize, self._check_key(),
+                                         self.output_metadata_extension)
+        return self._scan_index
+
+    def _indexed_checks(self, files, pool=None, full_scan=False):
+        """Yield `(file_path, code, missing tokens)` for each file, using the scan index.
+
+        Only the files that changed since they were last indexed are checked, in
+        `pool` if given. If `files` are all the files of the input folder
+        (`full_scan`), the files that are not there anymore are removed from the index.
+        """
+        index = self._get_scan_index()
+        check = partial(batch_check_file, metadata_extension=self.output_metadata_extension,
+                        tokens_to_ignore=self.tokens_to_ignore, token_min_length=self.token_min_length)
+        relpaths = []
+        changed = []
+        for file_path in files:
+            relpath = os.path.relpath(file_path, self.folder_to_organize)
+            try:
+                stamp = index.stamp(file_path)
+            except OSError:
+                index.remove(relpath)
+                continue
+            relpaths.append(relpath)
+            cached = index.lookup(relpath, stamp)
+            if cached:
+                yield (file_path,) + cached
+            elif pool:
+                changed.append((file_path, relpath, stamp))
+            else:
+                result = check(file_path)
+                index.store(relpath, stamp, result[1], result[2])
+                yield result
+        if changed:
+            results = pool.map(check, [os.fspath(file_path) for file_path, _, _ in changed], chunksize=64)
+            for (file_path, relpath, stamp), result in zip(changed, results):
+                index.store(relpath, stamp, result[1], result[2])
+                yield result
+        if full_scan:
+            index.prune(relpaths)
+
+    def _select_status(self, files):
+        """Only keep the files whose check status is `self.only` (e.g. 'missing')."""
+        code = {v: k for k, v in CHECK_STATUSES.items()}[self.only]
+        index = self._get_scan_index()
+        if self.refresh_index or index.last_scan is None:
+            logger.info('Updating the scan index...')
+            results = self._indexed_checks(files, full_scan=True)
+        else:
+            # NOTE: files added since the last full scan are not found (see `--refresh-index`)
+            logger.debug(f"Querying the scan index for the '{self.only}' files...")
+            results = self._indexed_checks(os.path.join(self.folder_to_organize, relpath)
+                                           for relpath in index.query(code))
+        for file_path, file_code, _ in results:
+            if file_code == code:
+                yield file_path if isinstance(file_path, FileRecord) else Path(file_path)
+
+    def _order_by_mismatch(self, files):
+        """Return the files sorted worst-first: the files with the largest ratio of
+        missing words, then the files without metadata and finally the clean ones.
+
+        In quick mode, the clean files are moved to the default output folder
+        right away (if there is one) instead of being returned.
+        """
+        files = list(files)
+        names = []
+        with_metadata = []
+        without_metadata = []
+        for file_path in files:
+            metadata = self._metadata_cache.get(f'{file_path}.{self.output_metadata_extension}')
+            if metadata is None:
+                without_metadata.append(file_path)
+                continue
+            old_name = Path(metadata.fields.get('Old file path', '')).name
+            filename = file_path.name if isinstance(file_path, FileRecord) else Path(file_path).name
+            names.append((normalize("NFKC", old_name), normalize("NFKC", filename)))
+            with_metadata.append(file_path)
+        with metrics.timer('check'):
+            scores = score_mismatches(names, self.tokens_to_ignore, self.token_min_length)
+        mismatched = []
+        clean = []
+        for file_path, (missing, significant) in zip(with_metadata, scores):
+            if missing:
+                mismatched.append((-missing / significant, -missing, file_path))
+            else:
+                clean.append(file_path)
+        # NOTE: sort() is stable, the files with the same score stay in scan order
+        mismatched.sort(key=lambda x: x[:2])
+        logger.info(f'{len(mismatched)} files with missing words, {len(without_metadata)} without metadata '
+                    f'and {len(clean)} clean files')
+        if self.quick_mode and self.output_folders and clean:
+            logger.info(f'Quick mode enabled, moving the {len(clean)} clean files to {self.output_folders[0]}...')
+            for file_path in clean:
+                self._move_or_link_file_and_maybe_meta(self.output_folders[0], file_path,
+                                                       f'{file_path}.{self.output_metadata_extension}')
+            clean = []
+        return [file_path for _, _, file_path in mismatched] + without_metadata + clean
+
+    def _check_file(self, file_path, metadata_path):
+        """Compute the header of `file_path` and compare its old and new filenames.
+
+        Nothing is printed so that it can be run ahead of time in the background
+        (see :class:`HeaderPrefetcher`).
+        """
+        with metrics.timer('check'):
+            if isinstance(file_path, FileRecord):
+                filename, folder = file_path.name, file_path.dir
+            else:
+                filename, folder = Path(file_path).name, Path(file_path).parent
+            filename = normalize("NFKC", filename)
+            if isinstance(file_path, FileRecord) and file_path.size >= 0:
+                # NOTE: the size found by the scan, the file isn't stat'ed again (like
+                # get_file_size() does)
+                _, file_size = convert_bytes_binary(file_path.size, unit='MiB')
+            else:
+                _, file_size = get_file_size(file_path, unit='MiB')
+            metadata = self._metadata_cache.get(metadata_path)
+            if metadata is None:
+                return CheckResult(filename, file_size, folder, False, None, None, 1)
+            old_name = Path(metadata.fields.get('Old file path', '')).name
+            old_name = normalize("NFKC", old_name)
+            matcher = self._get_token_matcher()
+            # TODO: fix partial
+            # Physics (old) Metaphysics and Physics (new) -> Physics is partial (which shouldn't)
+            similar_tokens, missing_tokens = matcher.compare(old_name, filename)
+            old_name_hl = matcher.highlight(old_name, similar_tokens, missing_tokens)
+            return CheckResult(filename, file_size, folder, True, old_name_hl, missing_tokens,
+                               2 if missing_tokens else 3)
+
+    def _get_conversion_cache(self):
+        if self.conversion_cache_size <= 0:
+            return None
+        if self._conversion_cache is None:
+            self._conversion_cache = ConversionCache(os.path.join(self.cache_dir, 'txt'),
+                                                     self.conversion_cache_size * 1024 ** 2)
+        return self._conversion_cache
+
+    def _get_fetch_cache(self):
+        if self.no_fetch_cache:
+            return None
+        if self._fetch_cache is None:
+            self._fetch_cache = FetchCache(os.path.join(self.cache_dir, 'fetch.sqlite'),
+                                           self.fetch_cache_ttl, self.fetch_cache_size)
+        return self._fetch_cache
+
+    def _get_ebook_meta_cache(self):
+        if self.ebook_meta_cache_size <= 0:
+            return None
+        if self._ebook_meta_cache is None:
+            self._ebook_meta_cache = EbookMetaCache(os.path.join(self.cache_dir, 'ebook_meta.sqlite'),
+                                                    self.ebook_meta_cache_size)
+        return self._ebook_meta_cache
+
+    def _get_isbn_cache(self):
+        if self._isbn_cache is None:
+            self._isbn_cache = IsbnCache(os.path.join(self.cache_dir, 'isbns.sqlite'))
+        return self._isbn_cache
+
+    def _harvest(self, file_path):
+        try:
+            self._isbn_harvester.schedule(file_path)
+        except OSError as e:
+            logger.debug(f"Couldn't schedule the search of ISBNs in '{file_path}': {e}")
+
+    def _close_scan_index(self):
+        if self._scan_index:
+            self._scan_index.close()
+            self._scan_index = None
+
+    def _get_token_matcher(self):
+        # Only recompiled when the settings change (e.g. with the `e` option)
+        matcher = self._token_matcher
+        if matcher is None or (matcher.tokens_to_ignore, matcher.token_min_length) != self._check_key():
+            matcher = TokenMatcher(self.tokens_to_ignore, self.token_min_length)
+            self._token_matcher = matcher
+        return matcher
+
+    def _check_key(self):
+        # The settings that a computed CheckResult depends on
+        return self.tokens_to_ignore, self.token_min_length
+
+    def _forget(self, file_path):
+        # Called when the organizer moves, renames or removes a file
+        self._metadata_cache.invalidate(f'{file_path}.{self.output_metadata_extension}')
+        if isinstance(file_path, FileRecord):
+            file_path.check_result = None
+        if self._prefetcher:
+            self._prefetcher.discard(file_path)
+
     def _header_and_check(self, file_path, metadata_path):
-        filename = Path(file_path).name
-        filename = normalize("NFKC", filename)
-        _, file_size = get_file_size(file_path, unit='MiB')
-        msg_size = bold(file_size)
-        msg = f"File\t\t'{filename}' ({msg_size} in '{Path(file_path).parent}')"
-        if not Path(metadata_path).exists():
+        self._log_transfer_status()
+        result = None
+        record = file_path if isinstance(file_path, FileRecord) else None
+        if record and record.check_key == self._check_key():
+            # e.g. the header is shown again after an option
+            result = record.check_result
+        if result is None and self._prefetcher:
+            result = self._prefetcher.take(file_path, self._check_key())
+            metrics.count('prefetch_hits' if result else 'prefetch_misses')
+        if result is None:
+            result = self._check_file(file_path, metadata_path)
+        if record:
+            record.check_key, record.check_result = self._check_key(), result
+        msg_size = bold(result.file_size)
+        msg = f"File\t\t'{result.filename}' ({msg_size} in '{result.folder}')"
+        if self._duplicate_finder:
+            twin = self._duplicate_finder.get(file_path)
+            if twin:
+                msg += bold(yellow(f" [duplicate of '{twin}']"))
+        if not result.has_metadata:
             logger.info(msg + bold(f"{red(' [no metadata]')}"))
+            if self._isbn_harvester:
+                # NOTE: usually already scheduled by the prefetcher
+                self._harvest(file_path)
+                isbns = self._isbn_harvester.get(file_path)
+                if isbns:
+                    logger.info('ISBNs found in the content: ' + bold(', '.join(isbns)))
             return 1
         logger.info(msg + bold(f" [has metadata]"))
-        old_path = self._get_old_path(file_path, metadata_path)
-        old_name = Path(old_path).name
-        old_name = normalize("NFKC", old_name)
-        similar_tokens = set()
-        missing_tokens = set()
-        partial_tokens = set()
-        old_name_sub = re.sub(self.tokens_to_ignore, r'', Path(old_name).stem, 0, re.MULTILINE)
-        # NOTE: not necessary to remove tokens in new filename?
-        new_name_sub = re.sub(self.tokens_to_ignore, r'', Path(filename).stem, 0, re.MULTILINE)
-        # old_tokens = re.findall(r"[^\W\d_]+|\d+", old_name_sub)
-        # new_tokens = re.findall(r"[^\W\d_]+|\d+", new_name_sub)
-        old_tokens = re.findall(r"[^\W\d_]+", old_name_sub)
-        new_tokens = re.findall(r"[^\W\d_]+", new_name_sub)
-        for old_token in old_tokens:
-            cleaned_old_token = remove_diacritics(old_token.lower())
-            found = False
-            if len(cleaned_old_token) >= self.token_min_length:
-                for new_token in new_tokens:
-                    if cleaned_old_token in remove_diacritics(new_token.lower()):
-                        # TODO: fix partial
-                        # Physics (old) Metaphysics and Physics (new) -> Physics is partial (which shouldn't)
-                        if False and len(cleaned_old_token) < len(new_token):
-                            partial_tokens.add(old_token)
-                        else:
-                            similar_tokens.add(old_token)
-                        found = True
-                        break
-                if not found:
-                    missing_tokens.add(old_token)
-        old_name_hl = copy(old_name)
-        old_name_hl = self._color_tokens_in_string(old_name_hl, missing_tokens)  # red (default)
-        old_name_hl = self._color_tokens_in_string(old_name_hl, similar_tokens, 'green')
-        # NOTE: Alexander (new) and Grammars and Automata (old) --> and considered as partial
-        # because found in Alexander (which should not)
-        # old_name_hl = self._color_tokens_in_string(old_name_hl, partial_tokens, 'yellow')
-        # NOTE: Only color the first three digits of year because parentheses capture them in regex
-        # TODO: add parenthesis to whole regex but test organize_ebooks/lib.py since it makes use of it
-        # old_name_hl = re.sub(get_re_year(), blue(r'\1'), old_name_hl, 0, re.MULTILINE)
-        match = re.search(get_re_year(), old_name_hl)
-        if match:
-            old_name_hl = old_name_hl.replace(match.group(), blue(match.group()))
-        else:
-            logger.debug('No year found in old filename')
-        old_name_hl = old_name_hl.replace('REDCODE', COLORS['RED'])
-        old_name_hl = old_name_hl.replace('GREENCODE', COLORS['GREEN'])
-        old_name_hl = old_name_hl.replace('NCCODE', COLORS['NC'])
-        logger.info(f"Old name\t'{old_name_hl}'")
-        if missing_tokens:
-            logger.info('Missing words from the old file name: ' + bold(', '.join(sorted(missing_tokens))))
+        logger.info(f"Old name\t'{result.old_name_hl}'")
+        if result.missing_tokens:
+            logger.info('Missing words from the old file name: ' + bold(', '.join(sorted(result.missing_tokens))))
             return 2
         logger.info(bold('No missing words from the old filename in the new!'))
         if not self.quick_mode:
@@ -341,22 +2672,126 @@ class InteractiveOrganizer:
 
     def _move_or_link_file_and_maybe_meta(self, new_folder, file_path, metadata_path):
         filename = Path(file_path).name
-        new_path = unique_filename(new_folder, filename)
-        new_metadata_path = f'{new_path}.{self.output_metadata_extension}'
+        new_path = self._destination_index.unique_filename(new_folder, filename)
+        if self.dry_run:
+            # Nothing is moved, the same name is available for the next file
+            self._destination_index.discard(new_path)
         # NOTE: they don't provide the last two params
         logger.info(f"Moving file '{file_path}' to '{new_path}'...")
-        move_or_link_file(file_path, new_path, self.dry_run, self.symlink_only)
+        self._forget(file_path)
+        self._transfer(f"'{file_path}' -> '{new_path}'", self._move_or_link_job,
+                       file_path, new_path, metadata_path)
+
+    @metrics.timer('move')
+    def _move_or_link_job(self, file_path, new_path, metadata_path):
+        try:
+            if self.dry_run:
+                move_or_link_file(file_path, new_path, self.dry_run, self.symlink_only)
+            else:
+                new_path = self._place_file(file_path, new_path)
+        except BaseException:
+            self._destination_index.discard(new_path)
+            raise
+        new_metadata_path = f'{new_path}.{self.output_metadata_extension}'
+        if not self.dry_run and not self.symlink_only:
+            self._destination_index.discard(file_path)
         if Path(metadata_path).exists():
             logger.info(f"Moving file '{metadata_path}' to '{new_metadata_path}'...")
             move_or_link_file(metadata_path, new_metadata_path, self.dry_run, self.symlink_only)
+            if not self.dry_run:
+                self._destination_index.add(new_metadata_path)
+                if not self.symlink_only:
+                    self._destination_index.discard(metadata_path)
+        self._record('moved', file_path, new_path)
+
+    def _place_file(self, file_path, new_path):
+        # Move or link `file_path` to `new_path` and return its new path. The destination is
+        # taken atomically so that no other file (moved by another transfer thread or
+        # another program) can take it at the same time. If it is already taken, the
+        # next available name is used.
+        Path(new_path).parent.mkdir(parents=True, exist_ok=True)
+        while True:
+            try:
+                if self.symlink_only:
+                    # NOTE: a symlink doesn't replace an existing file
+                    move_or_link_file(file_path, new_path, symlink_only=True)
+                else:
+                    os.close(os.open(new_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                    try:
+                        # clobber=True (in move) by default: the empty file created above is replaced
+                        move(file_path, new_path)
+                    except BaseException:
+                        remove_file(new_path)
+                        raise
+                return new_path
+            except FileExistsError:
+                new_path = self._destination_index.unique_filename(os.path.dirname(new_path),
+                                                                   Path(file_path).name)
+                logger.info(f"Moving file '{file_path}' to '{new_path}' instead...")
+
+    @metrics.timer('move')
+    def _move_and_remove_metadata_job(self, file_path, new_path, metadata_path):
+        # parents=True (create all folders along the path)
+        # exists_ok=True (no error if folders already exist)
+        Path(new_path).parent.mkdir(parents=True, exist_ok=True)
+        # clobber=True (in move) by default
+        move(file_path, new_path)
+        if Path(metadata_path).exists():
+            remove_file(metadata_path)
+        self._record('moved', file_path, new_path)
+
+    def _log_transfer_status(self):
+        if not self._transfer_queue:
+            return
+        for description, error in self._transfer_queue.new_failures():
+            logger.error(red(f'Transfer failed: {description}: {error}'))
+        status = self._transfer_queue.status()
+        if status:
+            logger.info(status)
+
+    def _transfer(self, description, job, *args):
+        # NOTE: in dry run, nothing is moved thus there is no need for a thread
+        if self._transfer_queue and not self.dry_run:
+            self._transfer_queue.submit(description, job, *args)
+        else:
+            job(*args)
+
+    def _on_prefetched(self, file_path, result):
+        # Files without metadata or with missing words are those that are most likely
+        # to be read in the terminal
+        if self._preconverter and result.code in [1, 2]:
+            try:
+                self._preconverter.schedule(file_path)
+            except OSError as e:
+                logger.debug(f"Couldn't schedule the conversion of '{file_path}': {e}")
+        if self._isbn_harvester and result.code == 1:
+            self._harvest(file_path)
+        if self._ebook_meta_preloader:
+            try:
+                self._ebook_meta_preloader.schedule(file_path)
+            except OSError as e:
+                logger.debug(f"Couldn't schedule ebook-meta for '{file_path}': {e}")
+
+    def _record(self, action, file_path, new_path=''):
+        if self._duplicate_finder and new_path and not self.dry_run:
+            self._duplicate_finder.rename(file_path, new_path)
+        # NOTE: nothing is recorded in dry run since the files are not moved
+        if self._journal and not self.dry_run:
+            self._journal.record(action, file_path, new_path)
 
     def _reorganize_interactively(self, file_path):
         metadata_path = f'{file_path}.{self.output_metadata_extension}'
         file_folder = Path(file_path).parent
         old_path = self._get_old_path(file_path, metadata_path)
         fname = normalize("NFKC", Path(old_path).name)
+        prefill = fname
+        if self._isbn_harvester and self._metadata_cache.get(metadata_path) is None:
+            # The first ISBN found in the content of the file
+            isbns = self._isbn_harvester.get(file_path, wait=True)
+            if isbns:
+                prefill = isbns[0]
         # filename must be within single quotes
-        opt = rlinput("Enter search terms or 'new filename': ", f"{fname}")
+        opt = rlinput("Enter search terms or 'new filename': ", prefill)
         logger.info(f'Your choice: {opt}')
         if opt == '':
             return 1
@@ -365,15 +2800,18 @@ class InteractiveOrganizer:
             logger.info(f"Renaming file to '{opt}', removing the old metadata if present and saving old "
                         "file path in the new metadata...")
             # NOTE: they don't use user's dry_run and symlink_only
-            move_or_link_file(file_path, Path(file_folder).joinpath(opt), self.dry_run, self.symlink_only)
+            self._forget(file_path)
+            with metrics.timer('move'):
+                move_or_link_file(file_path, Path(file_folder).joinpath(opt), self.dry_run, self.symlink_only)
             if Path(metadata_path).exists() and not self.dry_run:
                 remove_file(metadata_path)
+            self._record('renamed', file_path, Path(file_folder).joinpath(opt))
             file_path = Path(file_folder).joinpath(opt)
             if self.dry_run:
                 logger.debug("DRY RUN: not deleting old metadata nor saving new metadata")
             else:
                 metadata_path = f'{file_path}.{self.output_metadata_extension}'
-                with open(metadata_path, 'w') as f:
+                with metrics.timer('sidecar'), open(metadata_path, 'w') as f:
                     f.write(f'Old file path       : {old_path}')
             self._review_file(file_path)
             return 0
@@ -387,75 +2825,91 @@ class InteractiveOrganizer:
                         f"'{tmpmfile}'...")
             fetch_arg = f"--isbn='{isbn}'"
             fetch_sources = ISBN_METADATA_FETCH_ORDER
+            query = FetchCache.query_key(isbn=isbn)
         else:
             logger.info("Fetching metadata from sources "
                         f"{ORGANIZE_WITHOUT_ISBN_SOURCES} for title '{opt}' "
                         f"into '{tmpmfile}'...")
-            fetch_arg = "--title='$opt'"
+            fetch_arg = f"--title={shlex.quote(opt)}"
             fetch_sources = ORGANIZE_WITHOUT_ISBN_SOURCES
-        for fetch_source in fetch_sources:
-            logger.info(f"Fetching metadata from '{fetch_source}' sources...")
-            result = fetch_metadata(fetch_source, fetch_arg)
-            metadata = result.stdout
-            if metadata:
-                # Not adding [meta] before each line like they do
-                with open(tmpmfile, 'w') as f:
-                    f.write(metadata)
-                time.sleep(0.1)
-                logger.info('Successfully fetched metadata: ')
-                # TODO: add in function metadata wrap lines
-                for line in metadata.splitlines(1):
-                    for i, wrapped_line in enumerate(wrap(line, 100)):
-                        if i > 0:
-                            wrapped_line = f'  {wrapped_line}'
-                        logger.info(f'[meta] {wrapped_line}'.strip())
-                opt = rlinput('Do you want to use these metadata to rename the file (y/n/Q): ')
-                if opt in ['y', 'Y']:
-                    logger.info(blue('You chose yes, renaming the file...'))
-                elif opt in ['n', 'N']:
-                    logger.info(blue('You chose no, trying the next metadata source...'))
-                    continue
-                elif opt in ['q', 'Q']:
-                    logger.info(blue('You chose to quit, returning to the main menu!'))
-                    break
-                else:
-                    logger.info(f"Invalid choice '{opt}', returning to the main menu!")
-                    break
-                if Path(metadata_path).exists():
-                    logger.info(f"Removing old metadata file '{metadata_path}'...")
-                    if self.dry_run:
-                        logger.debug('DRY RUN: old metadata will not be deleted!')
+            query = FetchCache.query_key(title=opt)
+        # All the sources are queried concurrently but their results are shown in order
+        fetcher = MetadataFetcher(fetch_sources, fetch_arg, self.fetch_workers, self.fetch_timeout,
+                                  self._get_fetch_cache(), query, self.refresh_fetch_cache, self._calibre_pool)
+        try:
+            for fetch_source in fetch_sources:
+                logger.info(f"Fetching metadata from '{fetch_source}' sources...")
+                metadata = fetcher.result(fetch_source)
+                if metadata:
+                    # Not adding [meta] before each line like they do
+                    with open(tmpmfile, 'w') as f:
+                        f.write(metadata)
+                    time.sleep(0.1)
+                    logger.info('Successfully fetched metadata: ')
+                    # TODO: add in function metadata wrap lines
+                    for line in metadata.splitlines(1):
+                        for i, wrapped_line in enumerate(wrap(line, 100)):
+                            if i > 0:
+                                wrapped_line = f'  {wrapped_line}'
+                            logger.info(f'[meta] {wrapped_line}'.strip())
+                    opt = rlinput('Do you want to use these metadata to rename the file (y/n/Q): ')
+                    if opt in ['y', 'Y']:
+                        logger.info(blue('You chose yes, renaming the file...'))
+                        # The other sources are not needed anymore
+                        fetcher.cancel()
+                    elif opt in ['n', 'N']:
+                        logger.info(blue('You chose no, trying the next metadata source...'))
+                        continue
+                    elif opt in ['q', 'Q']:
+                        logger.info(blue('You chose to quit, returning to the main menu!'))
+                        break
                     else:
-                        remove_file(metadata_path)
-                logger.debug('Adding additional metadata to the end of the metadata file...')
-                more_metadata = 'Old file path       : {}\n' \
-                                'Metadata source     : {}\n'.format(file_path, fetch_source)
-                logger.debug(more_metadata)
-                with open(tmpmfile, 'a') as f:
-                    f.write(more_metadata)
-                if isbn == '':
-                    isbn = find_isbns(metadata, isbn_ret_separator=' - ')
-                if isbn:
+                        logger.info(f"Invalid choice '{opt}', returning to the main menu!")
+                        break
+                    if Path(metadata_path).exists():
+                        logger.info(f"Removing old metadata file '{metadata_path}'...")
+                        if self.dry_run:
+                            logger.debug('DRY RUN: old metadata will not be deleted!')
+                        else:
+                            remove_file(metadata_path)
+                    logger.debug('Adding additional metadata to the end of the metadata file...')
+                    more_metadata = 'Old file path       : {}\n' \
+                                    'Metadata source     : {}\n'.format(file_path, fetch_source)
+                    logger.debug(more_metadata)
                     with open(tmpmfile, 'a') as f:
-                        f.write(f'ISBN                : {isbn}')
-                logger.debug(f"Organizing '{file_path}' (with '{tmpmfile}')...")
-                # NOTE: They don't provide dry_run and next parameters
-                file_path = move_or_link_ebook_file_and_metadata(
-                    file_folder, file_path, tmpmfile, dry_run=self.dry_run,
-                    keep_metadata=True,
-                    output_filename_template=self.output_filename_template,
-                    output_metadata_extension=self.output_metadata_extension,
-                    symlink_only=self.symlink_only)
-                logger.debug(f"New path is '{file_path}'! Reviewing the new file...")
-                self._review_file(file_path)
-                # NOTE: they forgot to remove tmp file since they do a return and not a break
-                break
+                        f.write(more_metadata)
+                    if isbn == '':
+                        isbn = find_isbns(metadata, isbn_ret_separator=' - ')
+                    if isbn:
+                        with open(tmpmfile, 'a') as f:
+                            f.write(f'ISBN                : {isbn}')
+                    logger.debug(f"Organizing '{file_path}' (with '{tmpmfile}')...")
+                    self._forget(file_path)
+                    old_file_path = file_path
+                    # NOTE: They don't provide dry_run and next parameters
+                    with metrics.timer('move'):
+                        file_path = move_or_link_ebook_file_and_metadata(
+                            file_folder, file_path, tmpmfile, dry_run=self.dry_run,
+                            keep_metadata=True,
+                            output_filename_template=self.output_filename_template,
+                            output_metadata_extension=self.output_metadata_extension,
+                            symlink_only=self.symlink_only)
+                    self._record('renamed', old_file_path, file_path)
+                    logger.debug(f"New path is '{file_path}'! Reviewing the new file...")
+                    self._review_file(file_path)
+                    # NOTE: they forgot to remove tmp file since they do a return and not a break
+                    break
+        finally:
+            fetcher.cancel()
         logger.debug(f"Removing temp file '{tmpmfile}'...")
         remove_file(tmpmfile)
         return 0
 
     def _review_file(self, file_path):
         metadata_path = f'{file_path}.{self.output_metadata_extension}'
+        if self._watcher:
+            # Not returned by the watcher unless it changes
+            self._watcher.mark(file_path)
         while self._header_and_check(file_path, metadata_path):
             try:
                 old_path = self._get_old_path(file_path, metadata_path)
@@ -494,13 +2948,9 @@ class InteractiveOrganizer:
                             if self.dry_run:
                                 logger.debug('DRY RUN: metadata will not be deleted and file will not be moved!')
                             else:
-                                # parents=True (create all folders along the path)
-                                # exists_ok=True (no error if folders already exist)
-                                Path(new_path).parent.mkdir(parents=True, exist_ok=True)
-                                # clobber=True (in move) by default
-                                move(file_path, new_path)
-                                if Path(metadata_path).exists():
-                                    remove_file(metadata_path)
+                                self._forget(file_path)
+                                self._transfer(f"'{file_path}' -> '{new_path}'", self._move_and_remove_metadata_job,
+                                               file_path, new_path, metadata_path)
                                 return 0
                         else:
                             logger.warning(yellow("You didn't entered a file path (with extension)!"))
@@ -515,13 +2965,15 @@ class InteractiveOrganizer:
                     if result.returncode:
                         logger.error(red(f'{result.stderr}.strip()'))
                 elif opt in ['l']:
-                    open_with_less(file_path, **self.__dict__)
+                    if self._preconverter:
+                        self._preconverter.wait(file_path)
+                    open_with_less(file_path, conversion_cache=self._get_conversion_cache(),
+                                   calibre_pool=self._calibre_pool, **self.__dict__)
                 elif opt in ['c']:
-                    if Path(metadata_path).exists():
-                        with open(metadata_path, 'r') as f:
-                            metadata = f.read()
+                    metadata = self._metadata_cache.get(metadata_path)
+                    if metadata:
                         # TODO: add in function metadata wrap lines
-                        for line in metadata.splitlines(1):
+                        for line in metadata.text.splitlines(1):
                             for i, wrapped_line in enumerate(wrap(line, 100)):
                                 # logger.info('\t' + wrapped_line)
                                 if i > 0:
@@ -531,11 +2983,11 @@ class InteractiveOrganizer:
                         logger.warning(yellow('There is no metadata file present!'))
                 elif opt in ['?']:
                     logger.info('Starting ebook-meta...')
-                    result = get_ebook_metadata(file_path)
-                    # TODO: result.stderr? if returncode!=0?
-                    logger.debug(f'returncode: {result.returncode}')
+                    if self._ebook_meta_preloader:
+                        self._ebook_meta_preloader.wait(file_path)
+                    ebook_meta = get_cached_ebook_metadata(file_path, self._get_ebook_meta_cache(), self._calibre_pool)
                     # TODO: add in function metadata wrap lines
-                    for line in result.stdout.splitlines(1):
+                    for line in ebook_meta.splitlines(1):
                         for i, wrapped_line in enumerate(wrap(line, 100)):
                             # logger.info('\t' + wrapped_line)
                             if i > 0:
@@ -544,12 +2996,18 @@ class InteractiveOrganizer:
                 elif opt in ['e']:
                     evals = rlinput('Evaluate: TOKENS_TO_IGNORE=', f"{self.tokens_to_ignore}")
                     if evals:
+                        # NOTE: prefetched results computed with the old value are ignored (see _check_key())
                         self.tokens_to_ignore = evals
                 elif opt in ['t']:
                     logger.info("Launching 'bash'...")
                     subprocess.call(['bash'], shell=True)
+                    # Files might have been changed from the shell
+                    self._forget(file_path)
+                    if self._prefetcher:
+                        self._prefetcher.clear()
                 elif opt in ['s']:
                     logger.info(blue('Skipping the file!'))
+                    self._record('skipped', file_path)
                     return 0
                 elif opt in ['q']:
                     logger.debug('Quitting')
@@ -571,7 +3029,8 @@ class InteractiveOrganizer:
         logger.debug('Updating attributes for organizer...')
         for k, v in self.__dict__.items():
             new_val = kwargs.get(k)
-            if new_val and v != new_val:
+            # NOTE: `is not None` so that options can be set to 0 (e.g. `--prefetch 0`)
+            if new_val is not None and v != new_val:
                 logger.debug(f'{k}: {v} -> {new_val}')
                 self.__setattr__(k, new_val)
 
@@ -583,6 +3042,8 @@ class InteractiveOrganizer:
             logger.error(red(f"Input folder doesn't exist: {folder_to_organize}"))
             return 1
         self.folder_to_organize = folder_to_organize
+        # The output folders might have changed since the last session
+        self._destination_index.clear()
         self.output_folders = output_folders
         if self.output_folders is None:
             self.output_folders = []
@@ -592,25 +3053,144 @@ class InteractiveOrganizer:
         OUTPUT_FILENAME_TEMPLATE = self.output_filename_template
         ISBN_METADATA_FETCH_ORDER = self.isbn_metadata_fetch_order
         ORGANIZE_WITHOUT_ISBN_SOURCES = self.organize_without_isbn_sources
-        files = []
         if is_dir_empty(folder_to_organize):
             logger.warning(yellow(f'Folder is empty: {folder_to_organize}'))
+        # NOTE: the timers are only enabled if the metrics are saved
+        metrics.enabled = bool(self.stats)
+        metrics.reset()
+        profiler = None
+        if self.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            return self._organize(folder_to_organize)
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(self.profile)
+                logger.info(f"Profile saved in '{self.profile}' (see `python -m pstats {self.profile}`)")
+            if self.stats:
+                metrics.write(self.stats)
+                logger.info(f"Session metrics saved in '{self.stats}'")
+
+    def _organize(self, folder_to_organize):
+        if self.batch_mode:
+            try:
+                return self._batch_organize()
+            finally:
+                self._close_scan_index()
         logger.debug(f"Recursively scanning '{folder_to_organize}' for files "
                      f"(except .{self.output_metadata_extension})...")
-        for fp in Path(folder_to_organize).rglob('*'):
-            # Ignore directory and hidden files
-            if Path.is_file(fp) and not fp.name.startswith('.') and \
-                    not fp.name.endswith(self.output_metadata_extension):
-                # logger.debug(f"{fp.name}")
-                files.append(fp)
-        if not files:
+        files = metrics.timed_iter('scan', scan_folder(folder_to_organize, self.output_metadata_extension,
+                                                       self.scan_workers))
+        if self.only:
+            files = self._select_status(files)
+        if self.order == 'name':
+            # NOTE: the whole input folder is scanned before the first file is shown
+            files = iter(sorted(files, key=lambda x: x.name))
+        journal_path = self.journal or os.path.join(self.cache_dir, 'journals', f'{self._folder_id()}.jsonl')
+        if self.resume:
+            decided = SessionJournal.load(journal_path)
+            logger.info(f"Resuming: skipping the {len(decided)} files already reviewed in '{journal_path}'")
+            files = (fp for fp in files if os.path.relpath(fp, folder_to_organize) not in decided)
+        if not self.dry_run:
+            Path(journal_path).parent.mkdir(parents=True, exist_ok=True)
+            self._journal = SessionJournal(journal_path, folder_to_organize)
+        if self.order == 'mismatch':
+            # NOTE: after the journal is opened since the clean files might be moved (quick mode)
+            files = iter(self._order_by_mismatch(files))
+        # The next `prefetch` files are kept in a lookahead queue so that their
+        # headers can be computed in the background while the current file is reviewed
+        lookahead = deque()
+        if self.calibre_workers > 0:
+            self._calibre_pool = CalibreWorkerPool(self.calibre_workers, self.calibre_worker_cmd)
+        if self.preconvert > 0 and self._get_conversion_cache():
+            self._preconverter = Preconverter(self._get_conversion_cache(), self.preconvert, **self.__dict__)
+        if self.harvest_isbns > 0:
+            self._isbn_harvester = IsbnHarvester(self._get_isbn_cache(), self.harvest_isbns, self.harvest_pages,
+                                                 **self.__dict__)
+        if self.preload_ebook_meta > 0 and self._get_ebook_meta_cache():
+            self._ebook_meta_preloader = EbookMetaPreloader(self._get_ebook_meta_cache(), self.preload_ebook_meta,
+                                                            self._calibre_pool)
+        if self.prefetch > 0:
+            self._prefetcher = HeaderPrefetcher(self._check_file, self.output_metadata_extension,
+                                                self._on_prefetched)
+        if self.watch:
+            # Started before the scan so that files added during the session are not missed
+            self._watcher = FolderWatcher(folder_to_organize, self.output_metadata_extension,
+                                          self.watch_settle, self.watch_poll_interval)
+        if self.transfer_workers > 0:
+            self._transfer_queue = TransferQueue(self.transfer_workers)
+        if self.duplicates:
+            # The output folders first so that the twin of a file is preferably an organized one
+            folders = [folder for folder in self.output_folders if os.path.isdir(folder)] + [folder_to_organize]
+            self._duplicate_finder = DuplicateFinder(folders, self.output_metadata_extension, self.hash_workers)
+        found = False
+        try:
+            while True:
+                while len(lookahead) <= self.prefetch:
+                    fp = next(files, None)
+                    if fp is None:
+                        break
+                    lookahead.append(fp)
+                    if self._prefetcher:
+                        self._prefetcher.schedule(fp, self._check_key())
+                if not lookahead:
+                    if not self._watcher:
+                        break
+                    logger.info(blue('Waiting for new files (press Ctrl+C to quit)...'))
+                    files = iter(self._watcher.wait_for_files())
+                    continue
+                fp = lookahead.popleft()
+                if not found:
+                    logger.info('=====================================================')
+                    found = True
+                self._review_file(fp)
+                logger.info('=====================================================')
+        finally:
+            # NOTE: the transfers are done before the journal is closed since they record the moves
+            if self._transfer_queue:
+                self._transfer_queue.shutdown()
+                self._log_transfer_status()
+                self._transfer_queue = None
+            if self._prefetcher:
+                self._prefetcher.shutdown()
+                self._prefetcher = None
+            if self._fetch_cache:
+                self._fetch_cache.close()
+                self._fetch_cache = None
+            if self._preconverter:
+                self._preconverter.shutdown()
+                self._preconverter = None
+            if self._isbn_harvester:
+                self._isbn_harvester.shutdown()
+                self._isbn_harvester = None
+            if self._isbn_cache:
+                self._isbn_cache.close()
+                self._isbn_cache = None
+            if self._ebook_meta_preloader:
+                self._ebook_meta_preloader.shutdown()
+                self._ebook_meta_preloader = None
+            if self._ebook_meta_cache:
+                self._ebook_meta_cache.close()
+                self._ebook_meta_cache = None
+            if self._calibre_pool:
+                self._calibre_pool.close()
+                self._calibre_pool = None
+            if self._journal:
+                self._journal.close()
+                self._journal = None
+            self._close_scan_index()
+            if self._watcher:
+                self._watcher.close()
+                self._watcher = None
+            if self._duplicate_finder:
+                self._duplicate_finder.stop()
+                self._duplicate_finder = None
+        if not found:
             logger.warning(yellow(f'No ebooks found in folder: {folder_to_organize}'))
             return 0
-        files.sort(key=lambda x: x.name)
-        logger.info('=====================================================')
-        for fp in files:
-            self._review_file(fp)
-            logger.info('=====================================================')
         logger.info(blue('No more ebooks to organize!'))
         return 0
 
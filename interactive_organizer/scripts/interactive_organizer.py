@@ -7,15 +7,35 @@ Ref.: https://github.com/na--/ebook-tools
 """
 import argparse
 import codecs
+import importlib.util
 import logging
 import os
+import shutil
+import sys
 
 # TODO
 # __version__ = '0.1.0'
-from interactive_organizer import __version__, lib
-# import lib
-from interactive_organizer.lib import namespace_to_dict, setup_log, blue, green, red, yellow
-# from lib import namespace_to_dict, setup_log, blue, green, red, yellow
+from interactive_organizer import __version__, defaults
+from interactive_organizer.colors import blue, green, red, yellow
+
+
+# Ref.: https://docs.python.org/3/library/importlib.html#implementing-lazy-imports
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+# NOTE: `lib` (and `organize_ebooks` with it) is only loaded when one of its
+# attributes is first used, e.g. it is not loaded for `--version` nor `--help`
+# (the parser only uses `defaults` and `colors`)
+lib = lazy_import('interactive_organizer.lib')
 
 # import ipdb
 
@@ -139,13 +159,13 @@ def add_general_options(parser, add_opts=None, remove_opts=None,
     if checker.check('log-level'):
         parser_general_group.add_argument(
             '--log-level', dest='logging_level',
-            choices=['debug', 'info', 'warning', 'error'], default=lib.LOGGING_LEVEL,
-            help='Set logging level.' + get_default_message(lib.LOGGING_LEVEL))
+            choices=['debug', 'info', 'warning', 'error'], default=defaults.LOGGING_LEVEL,
+            help='Set logging level.' + get_default_message(defaults.LOGGING_LEVEL))
     if checker.check('log-format'):
         parser_general_group.add_argument(
             '--log-format', dest='logging_formatter',
-            choices=['console', 'only_msg', 'simple',], default=lib.LOGGING_FORMATTER,
-            help='Set logging formatter.' + get_default_message(lib.LOGGING_FORMATTER))
+            choices=['console', 'only_msg', 'simple',], default=defaults.LOGGING_FORMATTER,
+            help='Set logging formatter.' + get_default_message(defaults.LOGGING_FORMATTER))
     return parser_general_group
 
 
@@ -189,7 +209,8 @@ def required_length(nmin, nmax, is_list=True):
 
 
 def setup_argparser():
-    width = os.get_terminal_size().columns - 5
+    # NOTE: shutil's version doesn't fail when not run from a terminal (e.g. from cron)
+    width = shutil.get_terminal_size().columns - 5
     name_input = 'folder_to_organize'
     usage_msg = blue(f"%(prog)s [OPTIONS] {{{name_input}}} -o {{{'output_folder'}}} [{{{'output_folder'}}}]")
     desc_msg = 'Interactively and manually organize ebook files quickly.\n\n' \
@@ -212,24 +233,24 @@ def setup_argparser():
     convert_group = parser.add_argument_group(title=yellow('Convert-to-txt options'))
     convert_group.add_argument(
         '--djvu', dest='djvu_convert_method',
-        choices=['djvutxt', 'ebook-convert'], default=lib.DJVU_CONVERT_METHOD,
+        choices=['djvutxt', 'ebook-convert'], default=defaults.DJVU_CONVERT_METHOD,
         help='Set the conversion method for djvu documents.'
-             + get_default_message(lib.DJVU_CONVERT_METHOD))
+             + get_default_message(defaults.DJVU_CONVERT_METHOD))
     convert_group.add_argument(
         '--epub', dest='epub_convert_method',
-        choices=['epubtxt', 'ebook-convert'], default=lib.EPUB_CONVERT_METHOD,
+        choices=['epubtxt', 'ebook-convert'], default=defaults.EPUB_CONVERT_METHOD,
         help='Set the conversion method for epub documents.'
-             + get_default_message(lib.EPUB_CONVERT_METHOD))
+             + get_default_message(defaults.EPUB_CONVERT_METHOD))
     convert_group.add_argument(
         '--msword', dest='msword_convert_method',
-        choices=['catdoc', 'textutil', 'ebook-convert'], default=lib.MSWORD_CONVERT_METHOD,
+        choices=['catdoc', 'textutil', 'ebook-convert'], default=defaults.MSWORD_CONVERT_METHOD,
         help='Set the conversion method for epub documents.'
-             + get_default_message(lib.MSWORD_CONVERT_METHOD))
+             + get_default_message(defaults.MSWORD_CONVERT_METHOD))
     convert_group.add_argument(
         '--pdf', dest='pdf_convert_method',
-        choices=['pdftotext', 'ebook-convert'], default=lib.PDF_CONVERT_METHOD,
+        choices=['pdftotext', 'ebook-convert'], default=defaults.PDF_CONVERT_METHOD,
         help='Set the conversion method for pdf documents.'
-             + get_default_message(lib.PDF_CONVERT_METHOD))
+             + get_default_message(defaults.PDF_CONVERT_METHOD))
     # ===================
     # Interactive options
     # ===================
@@ -240,13 +261,75 @@ def setup_argparser():
              '`--keep-metadata`. Ebooks that contain all of the tokens from '
              'the old file name in the new one are directly moved to the '
              'default output folder.')
+    interactive_group.add_argument(
+        '--batch', dest='batch_mode', action='store_true',
+        help='Non-interactive quick mode: all the files are checked in parallel and '
+             'those that contain all of the tokens from the old file name in the new '
+             'one are moved to the default output folder. The other files are left '
+             'in place and listed with the reason in the report (see `--batch-report`).')
+    interactive_group.add_argument(
+        '--batch-report', dest='batch_report', metavar='PATH',
+        help='File where the report of the files skipped by the batch mode is written.'
+             + get_default_message(defaults.BATCH_REPORT))
+    interactive_group.add_argument(
+        '--batch-workers', dest='batch_workers', metavar='NUM', type=int,
+        help='Number of processes used for checking the files in batch mode.'
+             + get_default_message('number of CPUs'))
+    interactive_group.add_argument(
+        '--resume', dest='resume', action='store_true',
+        help='Skip the files that were already moved, renamed or skipped in the '
+             'previous sessions (as recorded in the journal, see `--journal`).')
+    interactive_group.add_argument(
+        '--journal', dest='journal', metavar='PATH',
+        help='File where the decisions made on each file (moved, renamed, skipped) '
+             'are recorded.'
+             + get_default_message('a file in `--cache-dir` specific to the folder to organize'))
+    interactive_group.add_argument(
+        '--only', dest='only', choices=list(defaults.CHECK_STATUSES.values()),
+        help='Only review the files without metadata, with missing words or without '
+             'missing words (clean). The results of the previous checks are saved in '
+             'a scan index so that only the files that changed are checked again and, '
+             'once the index is built, only the matching files are accessed.')
+    interactive_group.add_argument(
+        '--refresh-index', dest='refresh_index', action='store_true',
+        help='With `--only`, scan the whole input folder to update the scan index '
+             '(e.g. to find the files added since the last full scan).')
+    interactive_group.add_argument(
+        '--order', dest='order', choices=['scan', 'name', 'mismatch'],
+        help='Order in which the files are reviewed: as they are found in the input '
+             'folder (`scan`, i.e. folder by folder and sorted by name within a folder), '
+             'sorted by filename across all the folders (`name`, the first file is only '
+             'shown once the whole input folder is scanned) or worst-first (`mismatch`), '
+             'i.e. the files with the most missing words from the old filename first, '
+             'then the files without metadata and the clean ones last. With '
+             '`--quick-mode`, the clean files are moved to the default output folder '
+             'without being shown.'
+             + get_default_message(defaults.ORDER))
+    interactive_group.add_argument(
+        '--duplicates', dest='duplicates', action='store_true',
+        help='Look in the background for files with the same content in the input '
+             'and output folders and show it in the header of a file (`[duplicate of ...]`).')
+    interactive_group.add_argument(
+        '-w', '--watch', dest='watch', action='store_true',
+        help='Keep the session open once all the files are reviewed and review '
+             'the new (or changed) files as they arrive in the input folder.')
+    interactive_group.add_argument(
+        '--watch-settle', dest='watch_settle', metavar='SECONDS', type=float,
+        help='In watch mode, a new file is only reviewed once it and its metadata '
+             "file didn't change for this amount of time."
+             + get_default_message(defaults.WATCH_SETTLE))
+    interactive_group.add_argument(
+        '--watch-poll', dest='watch_poll_interval', metavar='SECONDS', type=float,
+        help='In watch mode, how often the folders are checked for changes when '
+             'inotify is not available (e.g. on macOS).'
+             + get_default_message(defaults.WATCH_POLL_INTERVAL))
     interactive_group.add_argument(
         '--token-min-length', dest='token_min_length', metavar='LENGTH',
         type=int,
         help='''When files and file metadata are parsed, they are split into
             words and ones shorter than this value are ignored. By default, single and two
             character number and words are ignored.'''
-             + get_default_message(lib.TOKEN_MIN_LENGTH))
+             + get_default_message(defaults.TOKEN_MIN_LENGTH))
     interactive_group.add_argument(
         '--tokens-to-ignore', dest='tokens_to_ignore', metavar='TOKENS',
         help='''A regular expression that is matched against the
@@ -255,7 +338,7 @@ def setup_argparser():
             online metadata searching like book, novel, series, volume and others,
             as well as probable publication years like (so 1999 is ignored while
             2033 is not).'''
-             + get_default_message(lib.TOKENS_TO_IGNORE))
+             + get_default_message(defaults.TOKENS_TO_IGNORE))
     interactive_group.add_argument(
         "-m", "---metadata-fetch-order", nargs='+',
         dest='isbn_metadata_fetch_order', metavar='METADATA_SOURCE',
@@ -268,11 +351,11 @@ def setup_argparser():
                 check the description for the `--allowed-plugin` option. If you use
                 Calibre versions that are older than 2.84, it's required to
                 manually set this option to an empty string.'''
-             + get_default_message(lib.ISBN_METADATA_FETCH_ORDER))
+             + get_default_message(defaults.ISBN_METADATA_FETCH_ORDER))
     interactive_group.add_argument(
         '--owis', '--organize-without-isbn-sources', nargs='+',
         dest='organize_without_isbn_sources', metavar='METADATA_SOURCE',
-        default=lib.ORGANIZE_WITHOUT_ISBN_SOURCES,
+        default=defaults.ORGANIZE_WITHOUT_ISBN_SOURCES,
         help='''This option allows you to specify the online metadata sources
             in which the script will try searching for books by non-ISBN
             metadata (i.e. author and title). The actual search is done by
@@ -283,18 +366,18 @@ def setup_argparser():
             older than 2.84 don't support the `--allowed-plugin` option, if you
             want to use such an old Calibre version you should manually set
             `organize_without_isbn_sources` to an empty string.'''
-             + get_default_message(lib.ORGANIZE_WITHOUT_ISBN_SOURCES))
+             + get_default_message(defaults.ORGANIZE_WITHOUT_ISBN_SOURCES))
     # It is hardcoded, no custom support
     """
     interactive_group.add_argument(
         "--ddm", "--diacritic-difference-masking",
-        dest='diacritic_difference_masking', default=lib.DIACRITIC_DIFFERENCE_MASKINGS,
+        dest='diacritic_difference_masking', default=defaults.DIACRITIC_DIFFERENCE_MASKINGS,
         help='Which differences due to accents and other diacritical marks to '
              'be ignored when comparing tokens in `quick-mode` and the '
              'interactive interface. The default value handles some basic '
              'cases like allowing letters like á, à, â and others instead of a '
              'and the reverse when comparing the old and new files.'
-             + get_default_message(lib.DIACRITIC_DIFFERENCE_MASKINGS))
+             + get_default_message(defaults.DIACRITIC_DIFFERENCE_MASKINGS))
     """
     # NOTE: they don't seem to make use of it
     """
@@ -318,30 +401,151 @@ def setup_argparser():
              'The first specified folder is the default.')
     input_output_group.add_argument(
         '-c', '--custom-move-base-dir', dest='custom_move_base_dir', metavar='PATH',
-        default=lib.CUSTOM_MOVE_BASE_DIR,
+        default=defaults.CUSTOM_MOVE_BASE_DIR,
         help='A base directory in whose sub-folders files can more easily be '
              'moved during the interactive session because of tab autocompletion.'
-             + get_default_message(lib.CUSTOM_MOVE_BASE_DIR))
+             + get_default_message(defaults.CUSTOM_MOVE_BASE_DIR))
     input_output_group.add_argument(
         '-r', '--restore-original-base-dir', dest='restore_original_base_dir',
-        metavar='PATH', default=lib.RESTORE_ORIGINAL_BASE_DIR,
+        metavar='PATH', default=defaults.RESTORE_ORIGINAL_BASE_DIR,
         help='If you want to enable the option of restoring files to their '
              'original folders (or at least with the same folder structure), '
              'set this as the base path.'
-             + get_default_message(lib.RESTORE_ORIGINAL_BASE_DIR))
+             + get_default_message(defaults.RESTORE_ORIGINAL_BASE_DIR))
     input_output_group.add_argument(
         '--oft', '--output-filename-template', dest='output_filename_template',
         metavar='TEMPLATE',
         help='''This specifies how the filenames of the organized files will
                 look. It is a bash string that is evaluated so it can be very flexible
                 (and also potentially unsafe).''' +
-             get_default_message(lib.OUTPUT_FILENAME_TEMPLATE))
+             get_default_message(defaults.OUTPUT_FILENAME_TEMPLATE))
     input_output_group.add_argument(
         '--ome', '--output-metadata-extension', dest='output_metadata_extension',
         metavar='EXTENSION',
         help='''This is the extension of the additional metadata file that is 
         saved next to each newly renamed file.'''
-             + get_default_message(lib.OUTPUT_METADATA_EXTENSION))
+             + get_default_message(defaults.OUTPUT_METADATA_EXTENSION))
+    # ===================
+    # Performance options
+    # ===================
+    performance_group = parser.add_argument_group(title=yellow('Performance options'))
+    performance_group.add_argument(
+        '--scan-workers', dest='scan_workers', metavar='NUM', type=int,
+        help='Number of threads used for scanning the sub-folders of the input '
+             'folder. The review starts as soon as the first folder is scanned.'
+             + get_default_message(defaults.SCAN_WORKERS))
+    performance_group.add_argument(
+        '--prefetch', dest='prefetch', metavar='NUM', type=int,
+        help='Number of upcoming files whose header (file size, old filename '
+             'from the metadata file, missing words) is computed in the background '
+             'while the current file is being reviewed. 0 disables it.'
+             + get_default_message(defaults.PREFETCH))
+    performance_group.add_argument(
+        '--hash-workers', dest='hash_workers', metavar='NUM', type=int,
+        help='With `--duplicates`, number of threads used to hash the files that have '
+             'the same size as another file.'
+             + get_default_message(defaults.HASH_WORKERS))
+    performance_group.add_argument(
+        '--stats', dest='stats', metavar='FILE',
+        help='Save the timings (calls, total, p50, p95 and max) of the phases of the '
+             'session (scan, check, sidecar I/O, fetch, convert, ebook-meta, move) and '
+             'some counters (e.g. cache hits) when it ends. The file is written in '
+             'the Prometheus text format if it ends with `.prom`, as JSON otherwise.')
+    performance_group.add_argument(
+        '--profile', dest='profile', metavar='FILE', nargs='?', const=defaults.PROFILE_FILENAME,
+        help='Run the session with cProfile and save the profile (for `python -m pstats`) '
+             'in FILE when it ends. NOTE: only the main thread is profiled.'
+             + get_default_message(defaults.PROFILE_FILENAME))
+    performance_group.add_argument(
+        '--transfer-workers', dest='transfer_workers', metavar='NUM', type=int,
+        help='Number of threads that move the files (and their metadata) to their '
+             'destination in the background so that the next file can be reviewed '
+             'right away. 0 moves the files before the next file is shown.'
+             + get_default_message(defaults.TRANSFER_WORKERS))
+    performance_group.add_argument(
+        '--fetch-workers', dest='fetch_workers', metavar='NUM', type=int,
+        help='Maximum number of metadata sources that are queried at the same '
+             'time (with `fetch-ebook-metadata`) when interactively reorganizing a file. '
+             'The fetched metadata are still shown in the order of the sources.'
+             + get_default_message(defaults.FETCH_WORKERS))
+    performance_group.add_argument(
+        '--fetch-timeout', dest='fetch_timeout', metavar='SECONDS', type=float,
+        help='Maximum time given to a metadata source to return its results.'
+             + get_default_message(defaults.FETCH_TIMEOUT))
+    performance_group.add_argument(
+        '--calibre-workers', dest='calibre_workers', metavar='NUM', type=int,
+        help='Number of persistent calibre processes that run `ebook-meta`, '
+             '`fetch-ebook-metadata` and `ebook-convert` so that calibre is not '
+             'started again for each command. When they are all busy or if they '
+             "can't be started, a new process is started for the command as usual. "
+             '0 disables them.'
+             + get_default_message(defaults.CALIBRE_WORKERS))
+    performance_group.add_argument(
+        '--calibre-worker-cmd', dest='calibre_worker_cmd', metavar='CMD',
+        help='Command that starts a calibre worker, `{script}` is replaced with the '
+             'path of the worker script.'
+             + get_default_message(defaults.CALIBRE_WORKER_CMD))
+    performance_group.add_argument(
+        '--cache-dir', dest='cache_dir', metavar='PATH',
+        help='Folder where the persistent caches are saved.'
+             + get_default_message(defaults.CACHE_DIR))
+    performance_group.add_argument(
+        '--no-fetch-cache', dest='no_fetch_cache', action='store_true',
+        help="Don't use the cache of the metadata fetched from online sources.")
+    performance_group.add_argument(
+        '--refresh-fetch-cache', dest='refresh_fetch_cache', action='store_true',
+        help='Always fetch metadata from the online sources and update the cache '
+             'with the new results.')
+    performance_group.add_argument(
+        '--fetch-cache-ttl', dest='fetch_cache_ttl', metavar='DAYS', type=float,
+        help='Number of days after which metadata from the cache are fetched again '
+             'from the online sources. The sources that found nothing are queried '
+             f'again after {defaults.FETCH_CACHE_NEGATIVE_TTL} day and the failed fetches '
+             '(e.g. network error or timeout) are not cached.'
+             + get_default_message(defaults.FETCH_CACHE_TTL))
+    performance_group.add_argument(
+        '--fetch-cache-size', dest='fetch_cache_size', metavar='NUM', type=int,
+        help='Maximum number of results kept in the cache of fetched metadata. The '
+             'least recently used results are removed first.'
+             + get_default_message(defaults.FETCH_CACHE_SIZE))
+    performance_group.add_argument(
+        '--conversion-cache-size', dest='conversion_cache_size', metavar='MIB', type=int,
+        help='Maximum total size (in MiB) of the text conversions kept in the cache '
+             'so that files can be read again in the terminal (`l` option) without '
+             'being converted again. 0 disables the cache.'
+             + get_default_message(defaults.CONVERSION_CACHE_SIZE))
+    performance_group.add_argument(
+        '--preconvert', dest='preconvert', metavar='NUM', type=int,
+        help='Number of processes used for converting the upcoming files without '
+             'metadata or with missing words to text in the background, so that '
+             'they can be read right away in the terminal (`l` option). It requires '
+             '`--prefetch` and the conversion cache. 0 disables it.'
+             + get_default_message(defaults.PRECONVERT))
+    performance_group.add_argument(
+        '--harvest-isbns', dest='harvest_isbns', metavar='NUM', type=int,
+        help='Number of processes used for searching ISBNs in the content of the '
+             'files without metadata in the background. The ISBN found is shown in '
+             'the header of the file and is the default input of the `i` option. '
+             '0 disables it.'
+             + get_default_message(defaults.HARVEST_ISBNS))
+    performance_group.add_argument(
+        '--harvest-pages', dest='harvest_pages', metavar='NUM', type=int,
+        help='With `--harvest-isbns`, number of pages converted to text at the start '
+             'and at the end of a file (PDF and DjVu only, the other files are '
+             'converted entirely).'
+             + get_default_message(defaults.HARVEST_PAGES))
+    performance_group.add_argument(
+        '--ebook-meta-cache-size', dest='ebook_meta_cache_size', metavar='NUM', type=int,
+        help='Maximum number of outputs of `ebook-meta` (`?` option) kept in the cache '
+             'so that it is not run again on the same file, even if it was renamed. '
+             'The least recently used outputs are removed first. 0 disables the cache.'
+             + get_default_message(defaults.EBOOK_META_CACHE_SIZE))
+    performance_group.add_argument(
+        '--preload-ebook-meta', dest='preload_ebook_meta', metavar='NUM', type=int,
+        help='Number of threads used for running `ebook-meta` on the upcoming files '
+             'in the background, so that the `?` option shows its output right away. '
+             'It requires `--prefetch` and the ebook-meta cache. 0 disables it.'
+             + get_default_message(defaults.PRELOAD_EBOOK_META))
     return parser
 
 
@@ -355,14 +559,18 @@ def show_exit_code(exit_code):
 
 def main():
     global QUIET
+    # The version is shown without building the parser (nor loading `lib`)
+    if sys.argv[1:] in [['-v'], ['--version']]:
+        print(f'{os.path.basename(sys.argv[0])} v{__version__}')
+        return 0
     try:
         parser = setup_argparser()
         args = parser.parse_args()
         QUIET = args.quiet
-        setup_log(args.quiet, args.verbose, args.logging_level, args.logging_formatter,
-                  logger_names=['interactive_script', 'interactive_lib', 'organize_lib'])
+        lib.setup_log(args.quiet, args.verbose, args.logging_level, args.logging_formatter,
+                      logger_names=['interactive_script', 'interactive_lib', 'organize_lib'])
         # Actions
-        args_dict = namespace_to_dict(args)
+        args_dict = lib.namespace_to_dict(args)
         exit_code = lib.organizer.interact(**args_dict)
     except KeyboardInterrupt:
         # Loggers might not be setup at this point
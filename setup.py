@@ -78,7 +78,7 @@ setup(name='interactive-organizer',
       author_email='rchfe23@gmail.com',
       license='MIT',
       python_requires='>=3.6',
-      packages=find_packages(exclude=['images']),
+      packages=find_packages(exclude=['benchmarks', 'benchmarks.*', 'images']),
       cmdclass={'build_py': build_py},
       include_package_data=True,
       install_requires=REQUIREMENTS,